@@ -9,12 +9,16 @@
 #	11/08/2015
 #
 # Packages:
-# networkx:		Graphs
+# numpy:		For computation
+# itertools:	The contour in chunks in writeMap
 
-import networkx as nx
+import itertools
+import numpy as np
 
 import treeToMobile
 import graphUtil
+import planeTree
+import planarMap
 
 
 
@@ -38,23 +42,49 @@ def findContourSequence( contSeq, T, node, parent ):
 		(with repetition) in the order they appear in a 
 		clockwise walk around the subtree induced by node
 		and its	descendants.
+
+	The walk uses a stack instead of recursion, so deep trees
+	do not exceed the recursion limit. For a planeTree.PlaneTree
+	see contourSequence and iterContour.
 	
 	'''
 
 	contSeq.append( node )
 
+	# Each element of the stack is a node and the children
+	# of the node which have not been visited yet (reversed).
 	children = graphUtil.childrenOf( node, T, parent )
 
-	# Ensure that the children are visited in the correct order.
-	children.sort()
+	children.sort( reverse = True )
+
+	stack = [ ( node, children ) ]
+
+	while stack:
+
+		node, children = stack[-1]
+
+		if children:
+
+			child = children.pop()
+
+			contSeq.append( child )
+
+			grandChildren = graphUtil.childrenOf( child, T, node )
+
+			grandChildren.sort( reverse = True )
 
-	# Recursively finish the objective for each child of node.
-	for child in children:
+			stack.append( ( child, grandChildren ) )
 
-		findContourSequence( contSeq, T, child, node )
+		else:
+
+			stack.pop()
+
+			# Walk back to the parent.
+			if stack:
+
+				contSeq.append( stack[-1][0] )
 
 
-	# If node is not the root, walk back to its parent.
 	if not parent is None:
 
 		contSeq.append( parent )
@@ -62,6 +92,208 @@ def findContourSequence( contSeq, T, node, parent ):
 
 
 
+def iterContour( T, mode = 'full', reverse = False ):
+	'''
+
+	for v in iterContour( T, mode, reverse ):
+	
+	In:	T is a planeTree.PlaneTree.
+		mode is 'full', 'white' or 'leaves'.
+		reverse is a boolean (default False).
+
+	Out: The vertices of T are generated lazily in the order they
+		appear in a clockwise walk around T, starting and ending
+		at the root (2n - 1 vertices), the same as
+		findContourSequence.
+
+		If mode == 'white', only every other vertex of the walk
+		is generated, without the last one, i.e. the white contour
+		sequence contSeq[:-1:2] (n - 1 vertices, all with even depth).
+
+		If mode == 'leaves', only the vertices without children
+		are generated (each leaf appears once in the walk).
+
+		If reverse == True, the same vertices are generated
+		in the opposite order (the walk is counterclockwise).
+
+	Only the path from the root to the current vertex is stored.
+
+	'''
+
+	if not mode in ( 'full', 'white', 'leaves' ):
+
+		raise ValueError("mode must be 'full', 'white' or 'leaves'.")
+
+
+	offsets = T.offsets
+
+	n = len(T)
+
+	# The walk has 2n - 1 steps, k is the index of the current one.
+	k = 0
+
+	# The white contour sequence is the even steps except the last
+	# one, which is the first one of the counterclockwise walk.
+	if reverse:
+
+		firstWhite, lastWhite = 2, 2*n - 2
+
+	else:
+
+		firstWhite, lastWhite = 0, 2*n - 3
+
+	if mode == 'full' or ( mode == 'white' and not reverse and n > 1 ) or \
+		( mode == 'leaves' and n == 1 ):
+
+		yield 0
+
+	step = -1 if reverse else 1
+
+	item = offsets.item
+
+	def visit( v ):
+
+		# [ v, its next child, the end of its children ]
+		a, b = item( v ), item( v + 1 )
+
+		if reverse:
+
+			return [ v, b - 1, a - 1 ]
+
+		return [ v, a, b ]
+
+
+	stack = [ visit(0) ]
+
+	while stack:
+
+		top = stack[-1]
+
+		if top[1] != top[2]:
+
+			# Walk down to the next child.
+			child = top[1]
+
+			top[1] += step
+
+			k += 1
+
+			top = visit( child )
+
+			stack.append( top )
+
+			if mode == 'full' or ( mode == 'white' and k % 2 == 0 and \
+				firstWhite <= k <= lastWhite ) or \
+				( mode == 'leaves' and top[1] == top[2] ):
+
+				yield child
+
+		else:
+
+			stack.pop()
+
+			if not stack:
+
+				break
+
+			# Walk back up to the parent.
+			k += 1
+
+			if mode == 'full' or ( mode == 'white' and k % 2 == 0 and \
+				firstWhite <= k <= lastWhite ):
+
+				yield stack[-1][0]
+
+
+
+
+def contourSequence( T, mode = 'full' ):
+	'''
+
+	c = contourSequence( T, mode )
+	
+	In:	T is a planeTree.PlaneTree.
+		mode is 'full', 'white' or 'leaves'.
+
+	Out: c is an integer vector with the same vertices as
+		iterContour( T, mode ), i.e. the contour sequence
+		of T (length 2n - 1), the white contour sequence
+		(length n - 1) or the leaves in contour order.
+
+	The position of each vertex v in the walk is computed
+	directly: if pre[v] is the index of v in depth first order
+	(see planeTree.PlaneTree.preorder), then the walk comes to v
+	at step 2 pre[v] - depth[v] and returns from v to its parent
+	2 size[v] - 1 steps later. So c is filled in place with
+	array operations and no Python loop over vertices.
+
+	'''
+
+	if not mode in ( 'full', 'white', 'leaves' ):
+
+		raise ValueError("mode must be 'full', 'white' or 'leaves'.")
+
+
+	n = len(T)
+
+	offsets = T.offsets
+
+	size = T.size
+
+	parent = T.parent
+
+	dtype = offsets.dtype
+
+	pre = T.preorder
+
+
+	if mode == 'leaves':
+
+		# The vertices in depth first order.
+		order = np.empty( n, dtype = dtype )
+
+		order[pre] = np.arange( n, dtype = dtype )
+
+		return order[ offsets[ order + 1 ] == offsets[ order ] ]
+
+
+	# The walk comes down to v at step down[v] and goes
+	# up from v (to parent[v]) at step up[v].
+	down = 2 * pre - T.depth
+
+	up = down[1:] + 2 * size[1:] - 1
+
+	if mode == 'full':
+
+		c = np.empty( 2*n - 1, dtype = dtype )
+
+		c[down] = np.arange( n, dtype = dtype )
+
+		c[up] = parent[1:]
+
+		return c
+
+
+	# The white contour sequence is the even steps except the last one.
+	c = np.empty( n - 1, dtype = dtype )
+
+	white = np.flatnonzero( down % 2 == 0 )
+
+	white = white[ down[white] < 2*n - 2 ]
+
+	c[ down[white] // 2 ] = white
+
+	even = np.flatnonzero( up % 2 == 0 )
+
+	even = even[ up[even] < 2*n - 2 ]
+
+	c[ up[even] // 2 ] = parent[ even + 1 ]
+
+	return c
+
+
+
+
 def successor( i, c, l ):
 	'''
 
@@ -102,14 +334,173 @@ def successor( i, c, l ):
 
 
 
-def mobileToGraph( M, eps = 1 ):
+def successors( l ):
+	'''
+
+	succ = successors( l )
+
+	In: l is an integer vector, the labels along the white
+		contour sequence c of a tree (without 'rho'), l[i] = l[c[i]].
+
+	Out: succ is an integer vector such that succ[i] is the
+		successor of i, the same as successor( i, c + ['rho'], l ):
+		the first j after i, cyclically, with l[j] == l[i] - 1,
+		or -1 (the index of 'rho') if there is no such j.
+
+	See iterSuccessors.
+
+	'''
+
+	for succ in iterSuccessors( l, max( len(l), 1 ) ):
+
+		return succ
+
+	return np.zeros( 0, dtype = np.int64 )
+
+
+
+
+def iterSuccessors( l, chunk = 2**20 ):
 	'''
 
-	G = mobileToGraph( M, eps )
+	for succ in iterSuccessors( l, chunk ):
+
+	In: l is an integer vector as in successors.
+		chunk is a positive integer (default 2**20).
+
+	Out: The vector successors( l ) is generated in pieces
+		succ[0:chunk], succ[chunk:2*chunk], ...
+
+	The pairs (label, index) are sorted once, so that the indices
+	with each label are consecutive and in increasing order. Then
+	the next occurrence of l[i] - 1 after i is found by a binary
+	search, and if there is none after i, the first one is the
+	cyclic successor. Everything is done with array operations,
+	so this takes O(n log n) time for all n indices together
+	instead of O(n) time for each index. Apart from the sorted
+	pairs, only O(chunk) memory is used at a time.
+
+	'''
+
+	l = np.asarray( l, dtype = np.int64 )
+
+	m = len(l)
+
+	if m == 0:
+
+		return
+
+	# key = (label, index) as one integer, with labels from 1
+	# so that the target labels l - 1 are non-negative.
+	label = l - l.min() + 1
+
+	key = np.sort( label * m + np.arange( m ) )
+
+
+	for start in range( 0, m, chunk ):
+
+		index = np.arange( start, min( start + chunk, m ) )
+
+		target = label[index] - 1
+
+		# The first index after i with the target label ...
+		k = np.searchsorted( key, target * m + index, side = 'right' )
+
+		found = k < m
+
+		k = np.minimum( k, m - 1 )
+
+		found = found & ( key[k] // m == target )
+
+		# ... or else the first index with the target label.
+		first = np.minimum( np.searchsorted( key, target * m ), m - 1 )
+
+		wrap = ~found & ( key[first] // m == target )
+
+		succ = np.full( len(index), -1, dtype = np.int64 )
+
+		succ[found] = key[ k[found] ] % m
+
+		succ[wrap] = key[ first[wrap] ] % m
+
+		yield succ
+
+
+
+
+def whiteContour( M ):
+	'''
+
+	vertex, source, lab = whiteContour( M )
+
+	In: M is a labeled mobile as in mobileToGraph.
+
+	Out: vertex is the vector of the white vertices of M
+		in increasing order (so white vertex k is vertex[k] in M).
+		source[i] is the white vertex (number) wcs[i] in the
+		white contour sequence of M and lab[i] is its label.
+
+	'''
+
+	if hasattr( M, 'to_networkx' ):
+
+		P = M
+
+		# The vertices of P are 0, 1, ..., n.
+		vertex = np.arange( len(P) )
+
+		label = P.data[ 'label' ]
+
+	else:
+
+		P = planeTree.fromNetworkx( M, min( M.nodes() ) )
+
+		vertex = P.data[ 'vertex' ]
+
+		label = np.array([ M.node[v][ 'label' ] for v in vertex.tolist() ])
+
+
+	# The white vertices of M are the vertices with even depth,
+	# number k is the white vertex with rank[k] == k.
+	isWhite = P.depth % 2 == 0
+
+	rank = np.cumsum( isWhite ) - 1
+
+	whiteVertex = vertex[ isWhite ]
+
+	if not P is M:
+
+		# Number the white vertices in increasing order.
+		order = np.argsort( whiteVertex, kind = 'mergesort' )
+
+		whiteVertex = whiteVertex[order]
+
+		rank[ isWhite ] = np.argsort( order )
+
+
+	# The white contour sequence: the nodes of M encountered at
+	# every other step of a clockwise walk around the tree, 
+	# wcs[k] = contSeq[2*k], without the last step (back to the root).
+	white = contourSequence( P, 'white' )
+
+	# The labels along the white contour sequence,
+	# lab[i] is the label of wcs[i] in M.
+	return whiteVertex, rank[white], label[white]
+
+
+
+
+def mobileToGraph( M, eps = 1, arrays = False ):
+	'''
+
+	G = mobileToGraph( M, eps, arrays )
 	
-	In: M is a labeled mobile whose vertices are integers.
+	In: M is a labeled mobile whose vertices are integers
+		(networkx.Graph or planeTree.PlaneTree with the labels
+		in M.data['label']).
 		We take the minimal vertex to be the root of M.
 		eps is either -1 or 1.
+		arrays is a boolean (default False).
 
 	Out: G is the bipartite planar map corresponding
 		to (M,eps) according to the inverse BDG bijection
@@ -119,83 +510,280 @@ def mobileToGraph( M, eps = 1 ):
 		The marked vertex in G is 'rho'. 
 		The root edge has the attribute 'awayFrom' which
 		is set to be either one of its endpoints.
+
+		If arrays is True, G is a planarMap.PlanarMap instead
+		of a networkx.MultiGraph: the white vertices of M are
+		numbered 0, 1, ..., n-1 in increasing order (G.vertex[v]
+		is the vertex in M), rho is n and the edges are in
+		the integer vectors G.source and G.target.
+		The root edge is edge number 0 and G.awayFrom is
+		one of its endpoints.
 	
 	'''
 
-	n = nx.number_of_edges( M )
+	whiteVertex, source, lab = whiteContour( M )
 
-	rootM = min( M.nodes() )
+	# (The external vertex 'rho' has "infinite" index, -1.)
+	rho = len( whiteVertex )
 
+	succ = successors( lab )
 
-	# Make a list of the nodes of M encountered
-	# on a clockwise walk around the tree.
-	contSeq = []
 
-	findContourSequence( contSeq, M, rootM, None )
+	# Put an edge between each wcs[i] and its successor, wcs[j],
+	# where j is found by the successor function.
+	target = np.where( succ < 0, rho, source[succ] )
 
 
-	# The white contour sequence is defined by
-	# wcs[k] = contSeq[2*k]
-	# We know that contSeq[-1] == contSeq[0],
-	# so the last element is unnecessary.
-	wcs = contSeq[:-1:2]
+	# The root edge in G is the first edge between the root of M
+	# and its successor, determine its direction.
+	if eps > 0:
 
+		awayFrom = target[0]
 
-	# Add an external vertex, 'rho',
-	# at the end of wcs.
-	# (It has "infinite" index, -1)
-	wcs.append( 'rho' )
+	else:
 
+		awayFrom = source[0]
 
-	# Create a new empty graph, G, out of the white vertices in M
-	# and the external vertex 'rho'.
-	G = nx.MultiGraph()
+	G = planarMap.PlanarMap( source, target, whiteVertex, awayFrom )
 
-	G.add_nodes_from( wcs )
+	rootM = G.name( G.source[0] )
 
+	rootSucc = G.name( G.target[0] )
 
-	# Make a dictionary, lab, for the labels of the mobile M
-	# such that for each node u in M, lab[u] is the label of u in M.
-	lab = {}
+	
+	# Decorate the special node and the root edge in G.
+	graphUtil.addStyle( G, 'color', 'green', [ 'rho' ] )
 
-	for node in G.nodes():
+	graphUtil.addStyle( G, 'color', 'blue', edges = [ ( rootM, rootSucc, 0 ) ] )
 
-		if node == 'rho': continue
 
-		lab[node] = M.node[node][ 'label' ]
+	if arrays:
 
+		return G
 
-	# Put an edge between each wcs[i] and its successor, wcs[j],
-	# where j is found by the successor function.
-	for i in range(n):
+	return G.to_networkx()
 
-		G.add_edge( wcs[i], wcs[ successor( i, wcs, lab ) ] )
 
-	
-	# Decorate the special node in G.
-	G.node[ 'rho' ][ 'color' ] = 'green'
 
 
-	# The root edge in G is the first edge between the root of M
-	# and its successor.
-	rootSucc = wcs[ successor( 0, wcs, lab ) ]
+def whiteNumbering( M ):
+	'''
+
+	Used by writeMap
+
+	P, label, number, rho = whiteNumbering( M )
+
+	In: M is a labeled mobile as in mobileToGraph.
+
+	Out: P is M as a planeTree.PlaneTree and label[v] is the label
+		of v in P. number( v ) is the vector of the numbers of the
+		white vertices v (a vector) of P in the map
+		mobileToGraph( M, eps, arrays = True ), and rho is the
+		number of white vertices.
+
+	If M is a PlaneTree, the white vertices are the even generations,
+	so number only uses M.generations and no vector of length n is
+	made. Otherwise M is converted and the numbers are stored.
+
+	'''
+
+	if hasattr( M, 'to_networkx' ):
+
+		g = M.generations.astype( np.int64 )
+
+		# The number of white vertices before each generation.
+		white = np.diff( g )
+
+		white[1::2] = 0
+
+		before = np.cumsum( white ) - white
+
+		def number( v ):
+
+			k = np.searchsorted( g, v, side = 'right' ) - 1
+
+			return before[k] + v - g[k]
+
+		return M, M.data[ 'label' ], number, int( white.sum() )
 
-	rootG = G[ rootM ][ rootSucc ][0]
-	
 
-	# Decorate the root edge and determine its direction.
-	rootG['color'] = 'blue'
+	P = planeTree.fromNetworkx( M, min( M.nodes() ) )
+
+	vertex = P.data[ 'vertex' ]
+
+	label = np.array([ M.node[v][ 'label' ] for v in vertex.tolist() ])
+
+	# Number the white vertices in increasing order, as whiteContour.
+	isWhite = P.depth % 2 == 0
+
+	rank = np.full( len(P), -1, dtype = np.int64 )
+
+	rank[ isWhite ] = np.argsort( np.argsort( vertex[ isWhite ],
+												kind = 'mergesort' ) )
+
+	return P, label, lambda v: rank[v], int( isWhite.sum() )
+
+
+
+
+def contourChunks( T, chunk, reverse = False ):
+	'''
+
+	Used by writeMap
+
+	for c in contourChunks( T, chunk, reverse ):
+
+	Out: The white contour sequence iterContour( T, 'white', reverse )
+		is generated in integer vectors of length chunk (the last
+		one may be shorter).
+
+	'''
+
+	walk = iterContour( T, 'white', reverse )
+
+	while True:
+
+		c = np.fromiter( itertools.islice( walk, chunk ), dtype = np.int64 )
+
+		if len(c) == 0:
+
+			return
+
+		yield c
+
+
+
+
+def writeMap( M, filename, eps = 1, chunk = 2**16 ):
+	'''
+
+	writeMap( M, filename, eps, chunk )
+
+	In: M is a labeled mobile and eps is -1 or 1, as in mobileToGraph.
+		filename is a string, the file is compressed with gzip
+		if it ends with '.gz'.
+		chunk is a positive integer (default 2**16).
+
+	Out: The planar map mobileToGraph( M, eps, arrays = True )
+		has been written to the file in the format described in
+		planarMap.writeHeader, without building the map in memory.
+		The root edge is the first edge as in mobileToGraph, but
+		the other edges are in the opposite order.
+		The file can be read with planarMap.readMap.
+
+	The white contour sequence is walked twice with iterContour,
+	chunk vertices at a time, and is never stored. The first walk
+	finds the first vertex with each label, which is the successor
+	of every vertex without a later one (and gives the root edge).
+	The second walk goes backwards and keeps the next vertex with
+	each label, so the successor of a vertex with label l is the
+	next vertex with label l - 1, either in the same chunk or in
+	the table. Apart from the mobile, the memory is O(chunk) plus
+	O(number of labels), not O(n). (If M is a networkx.Graph it is
+	converted to a PlaneTree first, which takes O(n) memory.)
+
+	'''
+
+	P, label, number, rho = whiteNumbering( M )
+
+	m = len(P) - 1
+
+	if m == 0:
+
+		raise ValueError('The mobile has no edges.')
+
+	dtype = planarMap.edgeType( rho + 1 )
+
+	# The labels are shifted to 1, 2, ..., so that l - 1 is an index.
+	low = int( label.min() ) - 1
+
+	# nextWhite[l] is the number of the next white vertex with
+	# label l (after the current one, cyclically), -1 if none.
+	nextWhite = np.full( int( label.max() ) - low + 1, -1, dtype = np.int64 )
+
+
+	# The first vertex with each label.
+	for c in contourChunks( P, chunk ):
+
+		l, first = np.unique( label[c] - low, return_index = True )
+
+		new = nextWhite[l] < 0
+
+		nextWhite[ l[new] ] = number( c[ first[new] ] )
+
+
+	# The root edge is from the root of M (number 0) to the
+	# first vertex with the label one less.
+	rootSucc = nextWhite[ label[0] - low - 1 ]
+
+	if rootSucc < 0:
+
+		rootSucc = rho
 
 	if eps > 0:
 
-		rootG['awayFrom'] = rootSucc
+		awayFrom = rootSucc
 
 	else:
 
-		rootG['awayFrom'] = rootM
+		awayFrom = 0
+
+
+	with planarMap.openMap( filename, 'wb' ) as f:
+
+		planarMap.writeHeader( f, rho, m, 0, rootSucc, awayFrom, dtype )
+
+		f.write( np.array( [ 0, rootSucc ], dtype = dtype ).tobytes() )
+
+		done = 0
+
+		for c in contourChunks( P, chunk, reverse = True ):
+
+			K = len(c)
+
+			l = label[c] - low
+
+			source = number( c )
+
+			# key = (label, position) as one integer, sorted, so for
+			# each position the last earlier position in the chunk
+			# (the next vertex in the contour) with label l - 1 is
+			# just before the first key >= (l - 1, position).
+			position = np.arange( K )
+
+			key = np.sort( l * K + position )
+
+			k = np.searchsorted( key, ( l - 1 ) * K + position ) - 1
+
+			found = ( k >= 0 ) & ( key[ np.maximum( k, 0 ) ] // K == l - 1 )
+
+			target = nextWhite[ l - 1 ]
+
+			target[found] = source[ key[ k[found] ] % K ]
+
+			target[ target < 0 ] = rho
+
+
+			# The first vertex in the contour with each label in the
+			# chunk is the last one in the chunk.
+			l, last = np.unique( l[::-1], return_index = True )
+
+			nextWhite[l] = source[ K - 1 - last ]
+
+			done += K
+
+			if done == m:
+
+				# The root edge has been written.
+				source, target = source[:-1], target[:-1]
+
+			edges = np.empty( ( len(source), 2 ), dtype = dtype )
+
+			edges[:,0] = source
 
+			edges[:,1] = target
 
-	return G
+			f.write( edges.tobytes() )
 
 
 
@@ -0,0 +1,645 @@
+
+
+# Python 2.7.6
+#
+#	python benchmark.py [options]
+#
+#	Times every stage of the pipeline, see python benchmark.py --help.
+#
+#	TG
+#
+# Packages:
+# numpy:			For computation.
+# resource:			Peak memory.
+# multiprocessing:	Each case runs in a new process.
+# json:				Results and baselines.
+# argparse:			Command line.
+
+import os
+import sys
+import time
+import json
+import shutil
+import platform
+import resource
+import tempfile
+import argparse
+import multiprocessing
+import numpy as np
+
+import graphUtil
+import makeTree
+import treeToMobile
+import bdg
+import maxima
+
+
+
+# The offspring distributions of the benchmark, by name.
+distributions = {
+
+	'fatTail': lambda: graphUtil.fatTail( 2.4788 ),
+
+	'binary': lambda: graphUtil.equivalentWeights( [ 1, 0, 1 ] ),
+
+	'geometric': lambda: graphUtil.Distribution( lambda k: 0.5 ** ( k + 1. ),
+												mean = 1., variance = 2. ) }
+
+
+# The stages of the benchmark, in the order they are run.
+stages = [ 'createXi', 'createXiBatch', 'treeBijection',
+			'makeMobile0', 'makeMobile1', 'makeMobile2', 'mobileToGraph',
+			'universeCount', 'isUniverse',
+			'saveGraphNpz', 'saveGraphEdges', 'saveGraphDot', 'saveGraphPng',
+			'saveGraphGraphviz' ]
+
+
+# The largest size for the stages which work on networkx graphs
+# (isUniverse does a search from every vertex, O(n^2) in all).
+stageLimits = { 'isUniverse': 10**4, 'saveGraphGraphviz': 10**3 }
+
+
+
+def peakMemory():
+	'''
+
+	m = peakMemory()
+
+	Out: m is the largest amount of memory used by this process
+		so far (or since resetPeakMemory), in megabytes (the maximum
+		resident set size from resource.getrusage, which is in
+		kilobytes on Linux).
+
+	'''
+
+	return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024.
+
+
+
+
+def residentMemory():
+	'''
+
+	m = residentMemory()
+
+	Out: m is the memory used by this process now, in megabytes
+		(the resident set size from /proc/self/statm), or None
+		if it is not known.
+
+	'''
+
+	try:
+
+		with open( '/proc/self/statm' ) as f:
+
+			pages = int( f.read().split()[1] )
+
+	except ( IOError, OSError, IndexError, ValueError ):
+
+		return None
+
+	return pages * resource.getpagesize() / 1024. ** 2
+
+
+
+
+def resetPeakMemory():
+	'''
+
+	reset = resetPeakMemory()
+
+	Out: If reset is True, the peak memory of this process (see
+		peakMemory) has been set to the memory it uses now, by
+		writing 5 to /proc/self/clear_refs (Linux 4.0 and later).
+		Otherwise the peak memory could not be reset.
+
+	'''
+
+	try:
+
+		with open( '/proc/self/clear_refs', 'w' ) as f:
+
+			f.write( '5' )
+
+	except ( IOError, OSError ):
+
+		return False
+
+	return residentMemory() is not None
+
+
+
+
+def isUniverseCount( G, d ):
+	'''
+
+	count = isUniverseCount( G, d )
+
+	In: G is a connected networkx graph with diameter d.
+
+	Out: count is the number of alpha-omega pairs in G, counted as
+		in maxima.universeCount, but with maxima.isUniverse from
+		every vertex, as the original maxima script did.
+
+	'''
+
+	count = 0
+
+	isEnd = set()
+
+	for u in G.nodes():
+
+		if u in isEnd:
+
+			continue
+
+		v = maxima.isUniverse( G, u, d )
+
+		if v != u:
+
+			count += 1
+
+			isEnd.add( v )
+
+	return count
+
+
+
+
+def caseSize( distribution, size ):
+	'''
+
+	n = caseSize( distribution, size )
+
+	Out: n is the number of vertices of the trees of the case
+		( distribution, size ), size + 1 if size is even and
+		distribution is 'binary', since then the trees have an
+		odd number of vertices, else size.
+
+	'''
+
+	if distribution == 'binary' and size % 2 == 0:
+
+		return size + 1
+
+	return size
+
+
+
+
+def runCase( distribution, size, seed = 0, selected = None,
+				directory = None ):
+	'''
+
+	results = runCase( distribution, size, seed, selected, directory )
+
+	In: distribution is a key in distributions and size is an integer.
+		seed is the seed of numpy.random (default 0).
+		selected is None (default, for all) or a list of stages.
+		directory is None or the directory of the files of saveGraph
+		(default None, for a new temporary directory).
+
+	Out: Each stage has been run once on a random tree with
+		caseSize( distribution, size ) vertices and results is a list
+		with a dictionary for each stage that was run, with
+
+			'stage', 'distribution', 'size', 'n', 'seed',
+			'seconds':		the wall time of the stage,
+			'peakMemory':	the peak memory of the process during
+							the stage (megabytes),
+			'stageMemory':	the memory the stage used at its peak,
+							on top of what was in use before it,
+			'exactMemory':	True if the peak memory was reset
+							before the stage (see resetPeakMemory),
+
+		and 'trials' (the number of multinomial trials) and 'tail'
+		(the probability mass lumped into the last entry of the
+		multinomial vectors, see makeTree.createXi) for createXi.
+		If exactMemory is False, peakMemory is the peak of the whole
+		process so far and stageMemory is only a lower bound (how
+		much the stage raised that peak).
+		The stages in stageLimits are skipped if size is too large and
+		saveGraphGraphviz is skipped if pygraphviz is not installed.
+
+	Each case is run in a new process (see benchmark), so the
+	cases do not share caches or memory.
+
+	'''
+
+	if selected is None:
+
+		selected = stages
+
+	n = caseSize( distribution, size )
+
+	xi = distributions[distribution]()
+
+	results = []
+
+	def run( stage, f, *args, **kwargs ):
+
+		if not stage in selected or size > stageLimits.get( stage, size ):
+
+			return None
+
+		np.random.seed( seed )
+
+		exact = resetPeakMemory()
+
+		if exact:
+
+			before = residentMemory()
+
+		else:
+
+			before = peakMemory()
+
+		start = time.time()
+
+		out = f( *args, **kwargs )
+
+		seconds = time.time() - start
+
+		peak = peakMemory()
+
+		results.append({ 'stage': stage, 'distribution': distribution,
+						'size': size, 'n': n, 'seed': seed,
+						'seconds': seconds, 'peakMemory': peak,
+						'stageMemory': max( peak - before, 0. ),
+						'exactMemory': exact })
+
+		return out
+
+
+	# The tree of the remaining stages comes from createXi.
+	out = run( 'createXi', makeTree.createXi, xi, n, maxiter = 10**6,
+				returnTrials = True )
+
+	if out is None:
+
+		np.random.seed( seed )
+
+		out = makeTree.createXi( xi, n, maxiter = 10**6, returnTrials = True )
+
+	else:
+
+		results[-1]['trials'], results[-1]['tail'] = out[1:]
+
+	Xi = out[0]
+
+	out = run( 'createXiBatch', makeTree.createXi, xi, n, maxiter = 10**6,
+				batch = True, returnTrials = True )
+
+	if out is not None:
+
+		results[-1]['trials'], results[-1]['tail'] = out[1:]
+
+	T = makeTree.makeTree( Xi )
+
+
+	M = run( 'treeBijection', treeToMobile.treeBijection, T )
+
+	if M is None:
+
+		M = treeToMobile.treeBijection( T )
+
+	for labels in [ 0, 1, 2 ]:
+
+		run( 'makeMobile%d' % labels, treeToMobile.makeMobile, M, 0, labels,
+				color = False )
+
+
+	# The map comes from the mobile with random labels.
+	if not 'makeMobile2' in selected:
+
+		np.random.seed( seed )
+
+		treeToMobile.makeMobile( M, 0, 2, color = False )
+
+	G = run( 'mobileToGraph', bdg.mobileToGraph, M, 1, arrays = True )
+
+	if G is None:
+
+		G = bdg.mobileToGraph( M, 1, arrays = True )
+
+	out = run( 'universeCount', maxima.universeCount, G, processes = 1 )
+
+	if out is not None:
+
+		results[-1]['count'] = out[0]
+
+	if 'isUniverse' in selected and size <= stageLimits['isUniverse']:
+
+		if out is None:
+
+			out = maxima.universeCount( G, processes = 1 )
+
+		H = G.to_networkx()
+
+		count = run( 'isUniverse', isUniverseCount, H, out[1] )
+
+		results[-1]['count'] = count
+
+
+	if directory is None:
+
+		tmp = tempfile.mkdtemp( prefix = 'benchmark' )
+
+	else:
+
+		tmp = directory
+
+	filename = os.path.join( tmp, 'Graph_%s_%d' % ( distribution, n ) )
+
+	try:
+
+		for stage, format in [ ( 'saveGraphNpz', 'npz' ),
+								( 'saveGraphEdges', 'edges' ),
+								( 'saveGraphDot', 'dot' ),
+								( 'saveGraphPng', 'png' ) ]:
+
+			run( stage, graphUtil.saveGraph, G, filename, format = format )
+
+		if 'saveGraphGraphviz' in selected and \
+			size <= stageLimits['saveGraphGraphviz']:
+
+			try:
+
+				import pygraphviz
+
+			except ImportError:
+
+				print '\tpygraphviz is not installed, saveGraphGraphviz skipped.'
+
+			else:
+
+				run( 'saveGraphGraphviz', graphUtil.saveGraph, G, filename,
+						prog = 'neato' )
+
+	finally:
+
+		if directory is None:
+
+			shutil.rmtree( tmp )
+
+
+	return results
+
+
+
+
+def caseResults( args ):
+	'''
+
+	Used by benchmark
+
+	results = caseResults( args )
+
+	Out: results == runCase( *args ).
+
+	'''
+
+	return runCase( *args )
+
+
+
+
+def benchmark( sizes = None, names = None, seed = 0, selected = None,
+				repeat = 1, directory = None ):
+	'''
+
+	results = benchmark( sizes, names, seed, selected, repeat, directory )
+
+	In: sizes is a list of integers (default None, for
+		10^2, 10^3, ..., 10^6) and names is a list of keys in
+		distributions (default None, for all of them).
+		seed, selected and directory are as in runCase.
+		repeat is a positive integer (default 1).
+
+	Out: results is the concatenation of runCase( name, size, seed,
+		selected, directory ) for all the sizes and names, where each
+		case has been run repeat times, each time in a new process,
+		and the run with the smallest total time is kept.
+
+	'''
+
+	if sizes is None:
+
+		sizes = [ 10**k for k in range( 2, 7 ) ]
+
+	if names is None:
+
+		names = sorted( distributions )
+
+	results = []
+
+	for name in names:
+
+		for size in sizes:
+
+			print '%s, n = %d...' % ( name, size )
+
+			best = None
+
+			for r in range( repeat ):
+
+				# A new process for each run, maxtasksperchild = 1.
+				pool = multiprocessing.Pool( 1, maxtasksperchild = 1 )
+
+				try:
+
+					case = pool.apply( caseResults,
+							(( name, size, seed, selected, directory ),) )
+
+				finally:
+
+					pool.close()
+
+					pool.join()
+
+				if best is None or sum( x['seconds'] for x in case ) < \
+									sum( x['seconds'] for x in best ):
+
+					best = case
+
+			results.extend( best )
+
+	return results
+
+
+
+
+def resultKey( result ):
+	'''
+
+	Used by compare
+
+	key = resultKey( result )
+
+	Out: key is ( stage, distribution, size, seed ) of result.
+
+	'''
+
+	return ( result['stage'], result['distribution'], result['size'],
+				result['seed'] )
+
+
+
+
+def compare( results, baseline, tolerance = 1.25, minSeconds = 0.05 ):
+	'''
+
+	regressions = compare( results, baseline, tolerance, minSeconds )
+
+	In: results, baseline are lists of results (see runCase).
+		tolerance is a number > 1 (default 1.25) and minSeconds is
+		a non-negative number (default 0.05).
+
+	Out: A table of the times in results and baseline, their ratio
+		and the memory used by the stage in results (stageMemory)
+		has been printed for each result which is in both.
+		regressions is the list of those results which took more than
+		tolerance times, and at least minSeconds longer than,
+		the baseline (so very short stages are not counted as
+		regressions because of noise).
+
+	'''
+
+	old = dict( ( resultKey( x ), x ) for x in baseline )
+
+	regressions = []
+
+	print '%-18s %-10s %8s %10s %10s %7s %10s' % ( 'stage', 'xi', 'n',
+			'baseline', 'seconds', 'ratio', 'memory' )
+
+	for x in results:
+
+		key = resultKey( x )
+
+		if not key in old:
+
+			continue
+
+		before = old[key]['seconds']
+
+		ratio = x['seconds'] / max( before, 1e-9 )
+
+		flag = ''
+
+		if ratio > tolerance and x['seconds'] - before >= minSeconds:
+
+			regressions.append( x )
+
+			flag = ' *'
+
+		print '%-18s %-10s %8d %10.4f %10.4f %7.2f %8.0f MB%s' % ( x['stage'],
+				x['distribution'], x['n'], before, x['seconds'], ratio,
+				x['stageMemory'], flag )
+
+	return regressions
+
+
+
+
+def environment():
+	'''
+
+	Used by main
+
+	env = environment()
+
+	Out: env is a dictionary describing the machine and the
+		versions of Python and numpy.
+
+	'''
+
+	return { 'python': platform.python_version(), 'numpy': np.__version__,
+				'machine': platform.machine(), 'platform': platform.platform(),
+				'processor': platform.processor(),
+				'time': time.strftime( '%Y-%m-%d %H:%M:%S' ) }
+
+
+
+
+def main( argv = None ):
+	'''
+
+	main( argv )
+
+	In: argv is None (default, for sys.argv[1:]) or a list of
+		command line arguments.
+
+	Out: The benchmark has been run and the results saved as JSON
+		(by default in benchmark.json). If a baseline (an earlier
+		output file) is given, the results have been compared to it
+		and the exit status is 1 if any stage is slower.
+
+	'''
+
+	parser = argparse.ArgumentParser( description =
+				'Time each stage of the pipeline.' )
+
+	parser.add_argument( '--sizes', type = int, nargs = '+',
+				default = [ 10**k for k in range( 2, 7 ) ],
+				help = 'the sizes of the trees (default 100 ... 1000000)' )
+
+	parser.add_argument( '--distributions', nargs = '+',
+				default = sorted( distributions ),
+				choices = sorted( distributions ),
+				help = 'the offspring distributions (default all)' )
+
+	parser.add_argument( '--stages', nargs = '+', choices = stages,
+				help = 'the stages to time (default all)' )
+
+	parser.add_argument( '--seed', type = int, default = 0,
+				help = 'seed for numpy.random (default 0)' )
+
+	parser.add_argument( '--repeat', type = int, default = 1,
+				help = 'the number of runs of each case, the fastest ' +
+						'is kept (default 1)' )
+
+	parser.add_argument( '--output', default = 'benchmark.json',
+				help = 'the results file (default benchmark.json)' )
+
+	parser.add_argument( '--baseline',
+				help = 'an earlier results file to compare with' )
+
+	parser.add_argument( '--tolerance', type = float, default = 1.25,
+				help = 'the largest ratio of times which is not a ' +
+						'regression (default 1.25)' )
+
+	args = parser.parse_args( argv )
+
+
+	results = benchmark( args.sizes, args.distributions, args.seed,
+							args.stages, args.repeat )
+
+	with open( args.output, 'w' ) as f:
+
+		json.dump({ 'environment': environment(), 'results': results },
+					f, indent = 1, sort_keys = True )
+
+	print 'Saved %s.' % args.output
+
+
+	if args.baseline is not None:
+
+		with open( args.baseline ) as f:
+
+			baseline = json.load( f )['results']
+
+		regressions = compare( results, baseline, args.tolerance )
+
+		if regressions:
+
+			print '%d regressions.' % len( regressions )
+
+			sys.exit( 1 )
+
+		print 'No regressions.'
+
+
+
+
+if __name__ == '__main__':
+	main()
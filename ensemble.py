@@ -0,0 +1,274 @@
+
+
+# Python 2.7.6
+#
+#	python ensemble.py [n] [count] [seed]
+#
+#	TG
+#
+# Packages:
+# numpy:			For computation.
+# multiprocessing:	Pool of worker processes.
+
+import sys
+import time
+import multiprocessing
+import numpy as np
+
+import graphUtil
+import makeTree
+import treeToMobile
+import bdg
+
+
+
+def sampleSeed( seed, i ):
+	'''
+
+	s = sampleSeed( seed, i )
+
+	In: seed and i are non-negative integers (less than 2**32).
+
+	Out: s is the seed of sample number i in an ensemble with
+		the root seed seed, the pair [ seed, i ].
+
+	'''
+
+	return [ int( seed ), int( i ) ]
+
+
+
+
+def sampleMap( xi, n, seed, labels = 2, method = 'multinomial' ):
+	'''
+
+	G = sampleMap( xi, n, seed, labels, method )
+
+	In: xi is an offspring distribution and n an integer
+		(see makeTree.generateTree), seed is a seed for
+		numpy.random.seed (such as the output of sampleSeed).
+		labels is 0, 1 or 2 (default 2, see treeToMobile.treeToMobile)
+		and method is passed on to makeTree.generateTree.
+
+	Out: G is a random planar map (planarMap.PlanarMap) made by
+		generateTree -> treeToMobile -> bdg.mobileToGraph, where
+		numpy.random has been seeded with seed first, so the same
+		seed always gives the same map. G.graph['seed'] is seed.
+		Nothing is printed.
+
+	'''
+
+	np.random.seed( seed )
+
+	T = makeTree.generateTree( xi, n, method, verbose = False )
+
+	M = treeToMobile.treeToMobile( T, labels = labels, color = False )
+
+	G = bdg.mobileToGraph( M, graphUtil.coin(), arrays = True )
+
+	G.graph['seed'] = seed
+
+	return G
+
+
+
+
+# The settings of the ensemble in the worker processes of iterEnsemble.
+ensembleSettings = None
+
+
+def shareSettings( settings ):
+	'''
+
+	Used by iterEnsemble
+
+	shareSettings( settings )
+
+	Out: ensembleSettings is settings.
+
+	'''
+
+	global ensembleSettings
+
+	ensembleSettings = settings
+
+
+
+
+def ensembleSample( seed, settings = None ):
+	'''
+
+	Used by iterEnsemble
+
+	result = ensembleSample( seed, settings )
+
+	In: settings is ( xi, n, labels, method, statistic ),
+		or None for ensembleSettings.
+
+	Out: result is statistic( G ), or G if statistic is None,
+		where G == sampleMap( xi, n, seed, labels, method ).
+
+	'''
+
+	if settings is None:
+
+		settings = ensembleSettings
+
+	xi, n, labels, method, statistic = settings
+
+	G = sampleMap( xi, n, seed, labels, method )
+
+	if statistic is None:
+
+		return G
+
+	return statistic( G )
+
+
+
+
+def iterEnsemble( xi, n, count, seed = 0, statistic = None, labels = 2,
+					method = 'multinomial', processes = None, chunk = 1 ):
+	'''
+
+	for result in iterEnsemble( xi, n, count, seed, statistic, labels,
+								method, processes, chunk ):
+
+	In: xi, n, labels, method are as in sampleMap.
+		count is the number of samples and seed is the root seed
+		of the ensemble (default 0).
+		statistic is None or a function of a planarMap.PlanarMap
+		(defined at the top level of a module, so that it can be
+		sent to the worker processes).
+		processes is the number of worker processes (default None,
+		for the number of CPUs), 1 for no workers.
+		chunk is the number of samples in each task (default 1).
+
+	Out: result is statistic( G ) (or G if statistic is None) for the
+		maps G == sampleMap( xi, n, sampleSeed( seed, i ), labels, method ),
+		i = 0, 1, ..., count-1, in this order.
+		If the loop over the results is left early, the workers
+		are stopped.
+
+	The samples are spread over a pool of processes. Each sample
+	seeds numpy.random with its own seed, so the results are the
+	same for any number of processes, and sample number i can be
+	made again on its own with sampleMap. With a statistic, only
+	its values are sent back from the workers instead of the maps.
+
+	'''
+
+	settings = ( xi, n, labels, method, statistic )
+
+	seeds = ( sampleSeed( seed, i ) for i in xrange( count ) )
+
+	if processes == 1:
+
+		for s in seeds:
+
+			yield ensembleSample( s, settings )
+
+		return
+
+
+	# The settings (xi may be a function) are given to the workers
+	# when they start instead of being sent with each task.
+	pool = multiprocessing.Pool( processes, shareSettings, ( settings, ) )
+
+	done = False
+
+	try:
+
+		for result in pool.imap( ensembleSample, seeds, chunk ):
+
+			yield result
+
+		done = True
+
+	finally:
+
+		# If the loop stopped early (break or an exception), the
+		# remaining tasks are not waited for.
+		if done:
+
+			pool.close()
+
+		else:
+
+			pool.terminate()
+
+		pool.join()
+
+
+
+
+def ensemble( xi, n, count, seed = 0, statistic = None, labels = 2,
+				method = 'multinomial', processes = None, chunk = 1 ):
+	'''
+
+	results = ensemble( xi, n, count, seed, statistic, labels,
+						method, processes, chunk )
+
+	Out: results is the list of the results of iterEnsemble
+		with the same arguments.
+
+	'''
+
+	return list( iterEnsemble( xi, n, count, seed, statistic, labels,
+								method, processes, chunk ) )
+
+
+
+
+def edgeCount( G ):
+	'''
+
+	m = edgeCount( G )
+
+	Out: m is the number of edges in G.
+
+	'''
+
+	return G.number_of_edges()
+
+
+
+
+def main():
+	'''
+
+	main()
+
+	Out: An ensemble of count random quadrangulations with n
+		vertices has been made (n, count and the root seed are
+		the arguments, default 1001, 100 and 0) and the time
+		has been printed.
+
+	'''
+
+	n, count, seed = 1001, 100, 0
+
+	if len( sys.argv ) > 1:
+
+		n = int( sys.argv[1] )
+
+	if len( sys.argv ) > 2:
+
+		count = int( sys.argv[2] )
+
+	if len( sys.argv ) > 3:
+
+		seed = int( sys.argv[3] )
+
+	start = time.time()
+
+	m = ensemble( [ 0.5, 0, 0.5 ], n, count, seed, edgeCount )
+
+	print '%d maps in %.2f s, %.1f edges on average' % \
+			( count, time.time() - start, np.mean( m ) )
+
+
+
+
+if __name__ == '__main__':
+	main()
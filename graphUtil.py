@@ -10,201 +10,1239 @@
 #
 # Packages:
 # numpy:					For computation.
-# networkx:					Graphs.
-# pygraphviz:				Visualizing graphs.
-# Queue:					markDistance uses Queue.
-# scipy.optimize.brentq:	For root finding.
-# scipy.special.zeta 		For fat tailed distributions
+# networkx:					Graphs (only imported by the functions
+#							for networkx graphs).
+# pygraphviz:				Visualizing graphs (only used by saveGraph,
+#							through networkx).
+# weakref:					Cache of probability tables.
+# collections:				Cache of tilting parameters.
+# scipy.special.zeta 		For fat tailed distributions (only
+#							imported by fatTail).
+#
+# Only numpy is imported with graphUtil, so processes which do not
+# draw graphs or use fat tails start quickly.
+
+
+import numpy as np
+import weakref
+import collections
+
+
+def equivalentWeights( w, mean = 1. ):
+	'''
+
+	p = equivalentWeights( w, mean )
+
+	In: w is a vector (list, numpy.ndarray, ...),
+		len(w) > 1 and w[k] > 0 for some k > 0.
+		mean is a positive number (default 1).
+		w can also be a list of such vectors (of any lengths).
+
+	Out: p is a probability weight sequence with expected value mean
+		that is equivalent to w in the sense of
+		'Simply generated trees, conditioned Galton-Watson trees,
+		random allocations and condensation' by Svante Janson,
+		i.e. p_k = t^k * w_k / Phi(t), where Phi is the generating
+		function of w. If w is a list of vectors, p is the list of
+		the equivalent weight sequences.
+
+	The parameters t are found by tiltParameters, all at once,
+	and kept in tiltCache (if tiltParameters fails, nothing is kept).
+
+	'''
+
+	batch = len(w) > 0 and np.ndim( w[0] ) > 0
+
+	if not batch:
+
+		w = [ w ]
+
+
+	W = [ np.asarray( v, dtype = float ) for v in w ]
+
+	keys = [ ( v.tobytes(), float(mean) ) for v in W ]
+
+	unknown = [ k for k in range( len(W) ) if not keys[k] in tiltCache ]
+
+	if unknown:
+
+		logT = tiltParameters( [ W[k] for k in unknown ], mean )
+
+		for k, s in zip( unknown, logT ):
+
+			tiltCache[ keys[k] ] = s
+
+			# Forget the oldest parameter if the cache is full.
+			if len( tiltCache ) > tiltCacheSize:
+
+				tiltCache.popitem( last = False )
+
+
+	P = []
+
+	for v, key in zip( W, keys ):
+
+		s = tiltCache[key]
+
+		# p_k = t^k * w_k / Phi(t), in logarithms so that
+		# t^k does not overflow.
+		with np.errstate( divide = 'ignore' ):
+
+			L = np.log( v ) + s * np.arange( len(v) )
+
+		p = np.exp( L - L.max() )
+
+		P.append( p / p.sum() )
+
+
+	if batch:
+
+		return P
+
+	return P[0]
+
+
+
+# The parameters log(t) found by equivalentWeights, by weight vector
+# and mean. The oldest ones are forgotten when there are more than
+# tiltCacheSize.
+tiltCache = collections.OrderedDict()
+
+tiltCacheSize = 4096
+
+
+
+def tiltParameters( W, mean = 1., tol = 1e-12, maxiter = 200 ):
+	'''
+
+	s = tiltParameters( W, mean, tol, maxiter )
+
+	In: W is a list of weight vectors as in equivalentWeights.
+		mean is a positive number (default 1).
+		tol is a positive number (default 1e-12) and maxiter
+		is a positive integer (default 200).
+
+	Out: s is a vector such that t = exp(s[j]) is the parameter
+		for W[j] in equivalentWeights, i.e. the unique solution of
+
+			sum_k (k - mean) * w_k * t^k = 0.
+
+	The mean of the tilted weights, m(s), increases with s and
+	m'(s) is their variance, so s is found by Newton's method,
+	for all the vectors at once (padded with zeros to the same
+	length). The sums are computed as log-sum-exp, relative to the
+	largest term, so they neither overflow nor underflow for long
+	vectors. A Newton step that leaves the interval known to contain
+	the root is replaced by bisection, or by a step of growing
+	length while the interval is unbounded.
+	Raises RuntimeError if some s[j] has not converged after
+	maxiter iterations.
+
+	'''
+
+	K = max( len(v) for v in W )
+
+	logW = np.full( ( len(W), K ), -np.inf )
+
+	for j, v in enumerate( W ):
+
+		if np.any( np.asarray( v ) < 0 ):
+
+			raise ValueError('The weights must be non-negative.')
+
+		with np.errstate( divide = 'ignore' ):
+
+			logW[ j, : len(v) ] = np.log( v )
+
+
+	k = np.arange( K, dtype = float )
+
+	support = np.isfinite( logW )
+
+	# The mean must lie strictly between the smallest and the
+	# largest k with w_k > 0 (or be one of them if they are equal).
+	low = np.where( support, k, np.inf ).min( axis = 1 )
+
+	high = np.where( support, k, -np.inf ).max( axis = 1 )
+
+	if np.any( ( low > mean ) | ( high < mean ) |
+				( ( low == mean ) & ( high > mean ) ) |
+				( ( high == mean ) & ( low < mean ) ) ):
+
+		raise ValueError('There are no equivalent weights with mean %g.' % mean)
+
+
+	s = np.zeros( len(W) )
+
+	lower = np.full( len(W), -np.inf )
+
+	upper = np.full( len(W), np.inf )
+
+	active = low < high
+
+	for iteration in range( maxiter ):
+
+		if not active.any():
+
+			break
+
+		L = logW[active] + s[active, None] * k
+
+		p = np.exp( L - L.max( axis = 1 )[:, None] )
+
+		p /= p.sum( axis = 1 )[:, None]
+
+		m = p.dot( k )
+
+		variance = np.maximum( p.dot( k**2 ) - m**2, 0 )
+
+		error = m - mean
+
+		done = np.abs( error ) <= tol * max( mean, 1. )
+
+
+		# The root is below s if the mean is too large.
+		sa = s[active]
+
+		lo = np.where( error < 0, sa, lower[active] )
+
+		hi = np.where( error > 0, sa, upper[active] )
+
+
+		width = np.maximum( 1., np.abs( sa ) )
+
+		with np.errstate( divide = 'ignore', invalid = 'ignore' ):
+
+			step = sa - error / variance
+
+			# While the interval is open at one end, a Newton step from
+			# a tiny (underflowed) variance can be huge, so the step
+			# must not be longer than the growing step.
+			inside = ( step > lo ) & ( step < hi ) & np.isfinite( step ) & \
+						( ( np.isfinite( lo ) & np.isfinite( hi ) ) |
+						( np.abs( step - sa ) <= width ) )
+
+			# Bisection, or a growing step towards an open end.
+			other = np.where( np.isinf( lo ), sa - width,
+						np.where( np.isinf( hi ), sa + width, ( lo + hi ) / 2. ) )
+
+		s[active] = np.where( done, sa, np.where( inside, step, other ) )
+
+		lower[active] = lo
+
+		upper[active] = hi
+
+		index = np.flatnonzero( active )
+
+		active[ index[done] ] = False
+
+
+	if active.any():
+
+		raise RuntimeError('The tilt did not converge in %d iterations' %
+							maxiter + ' for the weight vectors %s.' %
+							np.flatnonzero( active ).tolist())
+
+	return s
+
+
+
+
+def fatTail( c ):
+	'''
+
+	xi = fatTail( c )
+
+	In: c is a number in (2, 3).
+
+	Out: xi is a probability distribution on the integers
+		with expected value 1 (a Distribution).
+		There exist a and b such that
+			xi(0) = a
+			xi(k) = b * k^(-c)
+
+	'''
+
+	from scipy.special import zeta as RiemannZeta
+
+	b = 1.0 / RiemannZeta( c - 1, 1 )
+
+	a = 1.0 - b * RiemannZeta( c, 1 )
+
+	# Some workaround with boolean values needed:
+	f = lambda k: (a - b)*(k == 0) + b*( k + (k == 0) )**( - c )
+
+	# The variance is infinite since c < 3.
+	return Distribution( f, mean = 1., variance = np.inf )
+
+
+
+class Distribution( object ):
+	'''
+
+	xi = Distribution( f, mean, variance )
+
+	In: f is a probability distribution on the integers (must be
+		able to calculate the probabilities of multiple integers at
+		once), OR a vector (list, numpy.ndarray, ...) of weights,
+		such as the output of equivalentWeights, which are
+		normalized to sum to 1.
+		mean, variance are None (default) or the known expected
+		value and variance of f.
+
+	Out: xi is the same distribution, xi(k) is the probability of k
+		(so xi can be used wherever a distribution function can,
+		e.g. makeTree.createXi, makeTree.generateTree, multinomial).
+
+		The following are computed the first time they are used
+		and kept by xi:
+			xi.table( n ):	The table P, tail of pmfTable( xi, n ),
+							or the vector itself.
+			xi.cdf( k ):	P( X <= k ).
+			xi.mean, xi.variance (from the table unless given).
+			xi.sample( size ):	Independent draws from xi with the
+							alias method, O(1) time per draw.
+
+	'''
+
+	def __init__( self, f, mean = None, variance = None ):
+
+		if isinstance( f, Distribution ):
+
+			mean = f._mean if mean is None else mean
+			variance = f._variance if variance is None else variance
+			f = f.vector if f.function is None else f.function
+
+		if hasattr( f, '__call__' ):
+
+			self.function = f
+
+			self.vector = None
+
+		else:
+
+			self.function = None
+
+			self.vector = np.array( f, dtype = float )
+
+			self.vector /= self.vector.sum()
+
+		self._mean = mean
+		self._variance = variance
+
+		self._cdf = None
+		self._alias = None
+
+
+
+	def __call__( self, k ):
+
+		if self.function is not None:
+
+			return self.function( k )
+
+		k = np.asarray( k )
+
+		index = np.minimum( k, len( self.vector ) - 1 ).astype( int )
+
+		return np.where( ( k >= 0 ) & ( k < len( self.vector ) ),
+							self.vector[index], 0. )
+
+
+
+	def table( self, n = 1, tol = 1e-3, maxLength = 2**22 ):
+		'''
+
+		P, tail = xi.table( n, tol, maxLength )
+
+		Out: As pmfTable( xi, n, tol, maxLength ), except that
+			for a vector P is the vector and tail == 0.
+
+		'''
+
+		if self.function is None:
+
+			return self.vector, 0.
+
+		return pmfTable( self, n, tol, maxLength )
+
+
+
+	def cdf( self, k ):
+		'''
+
+		F = xi.cdf( k )
+
+		Out: F = P( X <= k ) for the integer (or integers) k,
+			from a table with tail mass at most 1e-9 (where possible).
+
+		'''
+
+		if self._cdf is None:
+
+			self._cdf = np.cumsum( self.table( 1, 1e-9 )[0] )
+
+		k = np.asarray( k )
+
+		index = np.clip( k, 0, len( self._cdf ) - 1 ).astype( int )
+
+		return np.where( k < 0, 0., np.where( k < len( self._cdf ),
+												self._cdf[index], 1. ) )
+
+
+
+	@property
+	def mean( self ):
+
+		if self._mean is None:
+
+			P = self.table( 1, 1e-9 )[0]
+
+			self._mean = P.dot( np.arange( len(P) ) )
+
+		return self._mean
+
+
+
+	@property
+	def variance( self ):
+
+		if self._variance is None:
+
+			P = self.table( 1, 1e-9 )[0]
+
+			k = np.arange( len(P) )
+
+			self._variance = P.dot( k**2 ) - P.dot( k )**2
+
+		return self._variance
+
+
+
+	def sample( self, size = None ):
+		'''
+
+		X = xi.sample( size )
+
+		Out: X is a draw from xi (an integer) if size is None,
+			otherwise a vector of size independent draws.
+
+		The alias tables (see 'Non-Uniform Random Variate Generation'
+		by Luc Devroye) are built once from xi.table(), with one extra
+		outcome for the tail of a distribution function. A draw in
+		the tail is found by inverting the distribution function
+		beyond the table.
+
+		'''
+
+		if self._alias is None:
+
+			P, tail = self.table()
+
+			if self.function is not None:
+
+				P = np.append( P, tail )
+
+			self._alias = aliasTables( P )
+
+
+		probability, alias = self._alias
+
+		K = len( probability )
+
+		m = 1 if size is None else size
+
+		column = np.random.randint( 0, K, size = m )
+
+		X = np.where( np.random.random( m ) < probability[column],
+						column, alias[column] )
+
+		if self.function is not None:
+
+			# Draws in the tail.
+			for i in np.flatnonzero( X == K - 1 ):
+
+				X[i] = self.tailSample( K - 1 )
+
+		if size is None:
+
+			return int( X[0] )
+
+		return X
+
+
+
+	def tailSample( self, L ):
+		'''
+
+		Used by sample
+
+		k = xi.tailSample( L )
+
+		Out: k is a draw from xi conditioned on k >= L.
+
+		'''
+
+		u = np.random.random() * max( 1. - self.table()[0].sum(), 0. )
+
+		while True:
+
+			P = self( np.arange( L, 2 * L + 0. ) )
+
+			S = np.cumsum( P )
+
+			if S[-1] >= u or S[-1] == 0:
+
+				return L + min( np.searchsorted( S, u ), len(P) - 1 )
+
+			u -= S[-1]
+
+			L = 2 * L
+
+
+
+
+def aliasTables( P ):
+	'''
+
+	probability, alias = aliasTables( P )
+
+	In: P is a vector of probabilities (summing to 1).
+
+	Out: Vose's alias tables for P: with K = len(P), draw a
+		column j uniformly, keep it with probability probability[j]
+		and otherwise take alias[j]. The result has distribution P.
+
+	'''
+
+	K = len(P)
+
+	probability = np.asarray( P, dtype = float ) * K / np.sum( P )
+
+	alias = np.arange( K )
+
+	small = np.flatnonzero( probability < 1 ).tolist()
+
+	large = np.flatnonzero( probability >= 1 ).tolist()
+
+	while small and large:
+
+		s = small.pop()
+
+		l = large[-1]
+
+		# Column s is filled up with l.
+		alias[s] = l
+
+		probability[l] -= 1 - probability[s]
+
+		if probability[l] < 1:
+
+			small.append( large.pop() )
+
+
+	# Rounding errors
+	probability[ small + large ] = 1
+
+	return np.minimum( probability, 1 ), alias
+
+
+
+
+def coin():
+	'''
+
+	result = coin()
+
+	UT: result == 1 with probability 0.5
+		result == -1 with probability 0.5
+
+	'''
+
+	rand = int(round( np.random.random() ))
+
+	return 1 - 2 * rand
+
+
+
+def pmfTable( xi, n = 1, tol = 1e-3, maxLength = 2**22 ):
+	'''
+
+	P, tail = pmfTable( xi, n, tol, maxLength )
+
+	In: xi is a probability distribution on the integers
+		(must be able to calculate the probabilities of
+		multiple integers at once).
+		n is an integer (default 1).
+		tol is a positive number (default 1e-3).
+		maxLength is an integer (default 2^22).
+
+	Out: P is a vector such that P[i] = xi(i) for i < len(P)
+		and tail = 1 - sum(P) is the probability mass that
+		is dropped by the truncation.
+
+		The length of P is the smallest power of 2 (at least 64)
+		such that n * tail <= tol, i.e. the expected number of
+		n draws from xi that land in the tail is at most tol
+		(unless that would make P longer than maxLength).
+
+	If xi is a Distribution made from a vector, P is the vector.
+
+	The tables are cached by the distribution object xi, so each
+	distribution is only evaluated once per run and the table is
+	reused by every caller. The cache keeps the longest table
+	and the tail of each of its prefixes of length 64, 128, ...,
+	and P is the prefix for this n and tol (a view, not a copy),
+	so one call with a large n does not make later calls with a
+	small n slower. The table is only rebuilt (longer) if a larger
+	n needs a smaller tail. The cache does not keep xi alive.
+
+	'''
+
+	if isinstance( xi, Distribution ) and xi.vector is not None:
+
+		return xi.vector, 0.
+
+	if xi in pmfTables:
+
+		P, tails = pmfTables[xi]
+
+		for k in range( len(tails) ):
+
+			L = 64 * 2**k
+
+			if n * tails[k] <= tol or L >= maxLength:
+
+				return P[:L], tails[k]
+
+		L = 2 * len(P)
+
+	else:
+
+		L = 64
+
+
+	while True:
+
+		P = xi( np.arange( L + 0. ) )
+
+		tail = max( 1. - P.sum(), 0. )
+
+		if n * tail <= tol or L >= maxLength:
+
+			break
+
+		L = 2 * L
+
+
+	# The tails of the shorter prefixes, for later calls.
+	tails = [ max( 1. - P[ : 64 * 2**k ].sum(), 0. )
+				for k in range( int( np.log2( L // 64 ) ) ) ] + [ tail ]
+
+	pmfTables[xi] = ( P, tails )
+
+	return P, tail
+
+
+# Cache for pmfTable
+pmfTables = weakref.WeakKeyDictionary()
+
+
+
+
+def multinomial( n, xi, max = None, size = None ):
+	'''
+
+	N = multinomial( n, xi, max, size )
+
+	In: n is an integer
+		xi is a probability distribution on the integers
+		(must be able to calculate the probabilities of
+		multiple integers at once),
+		max is None or an integer (default None).
+		size is None or an integer (default None).
+
+	Out: N is a Multinomial(n,P) random vector (except the
+		trailing zeroes have been trimmed), where P is
+		a vector of length max+1 such that P[i] = xi(i)
+		for i in {0, ..., max - 1} and P[max] = 1 - sum(P).
+
+		If max is None, then max+1 is the length of the
+		cached table pmfTable( xi, n ), so the tail mass
+		that is lumped into P[max] is negligible.
+
+		If size is an integer, then N is a size x K array
+		whose rows are independent Multinomial(n,P) vectors
+		(the trailing columns that are zero in every row
+		have been trimmed).
+
+	'''
+
+	if max is None:
+
+		P, tail = pmfTable( xi, n )
+
+	else:
+
+		P = xi( np.arange( max + 1. ) )
+
+
+	# Note that numpy puts the remaining mass 1 - sum(P[:-1])
+	# on the last entry.
+	if size is None:
+
+		N = np.random.multinomial( n, P )
+
+		return N[ : trimmedLength( N ) ]
+
+
+	N = np.random.multinomial( n, P, size = size )
+
+	return N[:, : trimmedLength( N.any( axis = 0 ) ) ]
+
+
+
+
+def trimmedLength( x ):
+	'''
+
+	Used by multinomial
+
+	K = trimmedLength( x )
+
+	Out: K is the length of the vector x without its trailing zeroes,
+		i.e. the length of numpy.trim_zeros( x, 'b' ), which loops
+		over the entries in Python and is slow for long tables.
+
+	'''
+
+	nonzero = np.flatnonzero( x )
+
+	if len( nonzero ) == 0:
+
+		return 0
+
+	return nonzero[-1] + 1
+
+
+
+
+def addStyle( G, attribute, value, nodes = None, edges = None ):
+	'''
+
+	addStyle( G, attribute, value, nodes, edges )
+
+	In: G is a graph (networkx.Graph, planeTree.PlaneTree
+		or planarMap.PlanarMap).
+		attribute and value are strings, such as 'color' and 'red'.
+		nodes is None, a list of vertices in G or a function
+		that takes G and returns a list of vertices (default None).
+		edges is None or a list of edges (u,v) in G,
+		or (u,v,key) if G is a multigraph (default None).
+
+	Out: A style rule has been recorded in G.graph[ 'styleRules' ].
+		When G is saved by saveGraph, the given edges, or else
+		the given nodes (all nodes if nodes is None) get
+		attribute = value in the drawing. Later rules override
+		earlier ones and the attributes stored in G.
+
+		Nothing is stored on the vertices or edges of G, so
+		graphs that are never drawn cost nothing extra.
+		A function for nodes should be picklable (e.g. a
+		functools.partial of a module level function) if G
+		is to be sent between processes.
+
+	'''
+
+	rule = ( attribute, value, nodes, edges )
+
+	G.graph.setdefault( 'styleRules', [] ).append( rule )
+
+
+
+
+def applyStyle( G, H, rules ):
+	'''
+
+	Used by saveGraph
+
+	applyStyle( G, H, rules )
+
+	In: G is a graph (networkx.Graph) and H is G converted
+		to a pygraphviz.AGraph.
+		rules is None or a list of style rules made by addStyle.
+
+	Out: The rules have been applied to the vertices and edges of H.
+
+	'''
+
+	if rules is None:
+		return
+
+
+	for attribute, value, nodes, edges in rules:
+
+		if edges is not None:
+
+			for e in edges:
+
+				if len(e) == 3:
+
+					H.get_edge( e[0], e[1], str( e[2] ) ).attr[attribute] = value
+
+				else:
+
+					H.get_edge( e[0], e[1] ).attr[attribute] = value
+
+			continue
+
+
+		if nodes is None:
+
+			nodes = G.nodes()
+
+		elif hasattr(nodes,'__call__'):
+
+			nodes = nodes( G )
+
+
+		for v in nodes:
+
+			H.get_node( v ).attr[attribute] = value
+
+
+
+
+def saveGraph( G, filename, draw = True, write = False, prog = 'neato',
+				format = 'graphviz' ):
+	'''
+
+	saveGraph( G, filename, draw, write, prog, format )
+
+	In: G is a graph (networkx.Graph or anything with
+		a to_networkx method, such as planeTree.PlaneTree)
+		filename is a string
+		draw, write are boolean (default True, False)
+		format is 'graphviz' (default), 'npz', 'edges', 'dot' or 'png'.
+
+	UT: The style rules of G (see addStyle) are applied to the
+		drawing, but not to G itself.
+
+		If prog is one of
+		'neato','dot','twopi','circo','fdp','nop'
+		then the graph, G, gets the layout prog and:
+
+			If draw == True, then an image of the graph
+			is saved in filename.png.
+			Else, if draw == False, no image is saved.
+
+			If write == True, the graph is saved
+			in text format in filename.dot.
+
+		Else, if prog is not on the list,
+		the graph gets no particular layout and:
+
+			No image of the graph is saved.
+
+			If write == True, the graph is saved
+			in text format in filename.dot.
+
+		If format is not 'graphviz', pygraphviz is not used,
+		draw, write and prog are ignored and the graph is only
+		saved, directly from its vertex and edge arrays:
+
+			'npz':		The edges in filename.npz, see writeNpz.
+			'edges':	A list of edges in filename.txt,
+						see writeEdgeList.
+			'dot':		The graph, its attributes and style rules
+						in filename.dot, without a layout,
+						see writeDot.
+			'png':		A picture of the graph in filename.png,
+						for large graphs, see rasterMap.drawMap.
+
+	'''
+
+	writers = { 'npz': writeNpz, 'edges': writeEdgeList, 'dot': writeDot }
+
+	if format == 'png':
+
+		# rasterMap uses graphUtil, so it is imported here.
+		import rasterMap
+
+		rasterMap.drawMap( G, filename )
+
+		return
+
+	if format != 'graphviz':
+
+		if not format in writers:
+
+			raise ValueError('Unknown format: %s' % format)
+
+		writers[format]( G, filename )
+
+		return
+
+
+	progValid = prog in [ 'neato', 'dot', 'twopi', 'circo', 'fdp', 'nop' ]
+
+	if draw and not progValid:
+		# Print warning if draw and progValid disagree.
+
+		print 'WARNING: prog = ' + prog \
+			+ ' is not one of neato|dot|twopi|circo|fdp|nop.' \
+			+ '\n\tNothing is drawn.'
+
+		draw = False
+
+
+	import networkx as nx
 
+	if hasattr( G, 'to_networkx' ):
+
+		G = G.to_networkx()
+
+
+	# Convert the graph from networkx.Graph
+	# to pygraphviz.AGraph, without the style rules.
+	rules = G.graph.pop( 'styleRules', None )
+
+	try:
+
+		H = nx.nx_agraph.to_agraph( G )
+
+	finally:
+
+		if rules is not None:
+
+			G.graph[ 'styleRules' ] = rules
+
+
+	# Only now are the style rules turned into attributes.
+	applyStyle( G, H, rules )
+
+
+	if progValid:
+
+		print '\tLayout...'
+
+		H.layout(prog=prog)
+
+	if draw:
+
+		print '\tDraw %s.png...' % filename
+
+		H.draw(filename + '.png')
+
+	if write:
+
+		print '\tWrite %s.dot...' % filename
+
+		H.write(filename + '.dot')
+
+
+	return
 
-import numpy as np
-import networkx as nx
-import pygraphviz as pgv
-import Queue
-from scipy.optimize import brentq
-from scipy.special import zeta as RiemannZeta
 
 
-def equivalentWeights( w ):
+def edgeArrays( G ):
 	'''
 
-	p = equivalentWeights( w )
+	source, target, names = edgeArrays( G )
 
-	In: w is a vector (list, numpy.ndarray, ...),
-		len(w) > 1 and w[k] > 0 for some k > 0.
+	In: G is a graph (networkx.Graph, planeTree.PlaneTree
+		or planarMap.PlanarMap).
 
-	Out: p is a probability weight sequence with expected value 1
-		that is equivalent to w in the sense of
-		'Simply generated trees, conditioned Galton-Watson trees,
-		random allocations and condensation' by Svante Janson.
+	Out: The vertices of G are numbered 0, 1, ..., N-1,
+		names[v] is the vertex number v in G, and the edges of G
+		are ( names[ source[i] ], names[ target[i] ] ) (in the
+		order of G.edges() for a networkx.Graph).
 
 	'''
 
-	n = len(w)
+	if hasattr( G, 'source' ):
 
-	w = np.array( w )
+		return G.source, G.target, G.names()
 
-	nrange = np.arange( n )
 
+	if hasattr( G, 'offsets' ):
 
-	# f = sum_k (k - 1) * w_k * t^k
-	f = lambda z: sum( ( nrange - 1. ) * w * z**nrange )
+		n = len(G)
 
-	# Root search interval
-	a = 0
-	b = 1.0
+		return G.parent[1:], np.arange( 1, n ), range(n)
 
-	# Ensure that f changes sings on [a,b]
-	while f(b) < 0:
-		b = 2*b
 
+	names = list( G.nodes() )
 
-	# Find the unique root of f on [a,b]
-	t = brentq( f, a, b )
+	number = dict( zip( names, range( len(names) ) ) )
 
+	edges = np.array([ ( number[u], number[v] ) for u, v in G.edges() ],
+						dtype = np.int64 ).reshape( -1, 2 )
 
-	# Phi is the generating function of w
-	Phi_t = sum( w * t**nrange )
+	return edges[:,0], edges[:,1], names
 
 
-	# p_k = t^k * w_k / Phi(k)
-	return t**nrange * w / Phi_t
 
 
-def fatTail( c ):
+def writeNpz( G, filename ):
 	'''
 
-	xi = fatTail( c )
+	Used by saveGraph
 
-	In: c is a number in (2, 3).
+	writeNpz( G, filename )
 
-	Out: xi is a probability distribution on the integers
-		with expected value 1.
-		There exist a and b such that
-			xi(0) = a
-			xi(k) = b * k^(-c)
+	Out: The edges of G (see edgeArrays) have been saved in
+		filename.npz, with numpy.savez, as the vectors
+		'source' and 'target' and the names of the vertices as
+		'vertex'. The vectors in G.data of a planeTree.PlaneTree
+		are saved too, and 'rho', 'rootEdge' and 'awayFrom'
+		of a planarMap.PlanarMap.
 
 	'''
 
-	b = 1.0 / RiemannZeta( c - 1, 1 )
+	source, target, names = edgeArrays( G )
 
-	a = 1.0 - b * RiemannZeta( c, 1 )
+	arrays = {}
 
-	# Some workaround with boolean values needed:
-	return lambda k: (a - b)*(k == 0) + b*( k + (k == 0) )**( - c )
+	if hasattr( G, 'source' ):
 
+		arrays['vertex'] = G.vertex
 
+		arrays['rho'] = G.rho
 
-def coin():
+		arrays['rootEdge'] = G.rootEdge
+
+		arrays['awayFrom'] = G.awayFrom
+
+	else:
+
+		arrays['vertex'] = np.array( names )
+
+	if hasattr( G, 'data' ):
+
+		arrays.update( G.data )
+
+	arrays['source'] = source
+
+	arrays['target'] = target
+
+	print '\tWrite %s.npz...' % filename
+
+	np.savez( filename + '.npz', **arrays )
+
+
+
+
+def writeEdgeList( G, filename, chunk = 2**16 ):
 	'''
 
-	result = coin()
+	Used by saveGraph
 
-	UT: result == 1 with probability 0.5
-		result == -1 with probability 0.5
+	writeEdgeList( G, filename, chunk )
+
+	Out: The edges of G (see edgeArrays) have been written to
+		filename.txt, one edge 'u v' on each line, chunk lines
+		at a time.
 
 	'''
 
-	rand = int(round( np.random.random() ))
+	source, target, names = edgeArrays( G )
 
-	return 1 - 2 * rand
+	print '\tWrite %s.txt...' % filename
+
+	with open( filename + '.txt', 'w' ) as f:
+
+		for a in range( 0, len(source), chunk ):
+
+			f.write( ''.join([ '%s %s\n' % ( names[u], names[v] )
+						for u, v in zip( source[ a : a + chunk ].tolist(),
+										target[ a : a + chunk ].tolist() ) ]) )
 
 
 
-def multinomial( n, xi, max=999 ):
+
+def dotId( x ):
 	'''
 
-	N = multinomial( n, xi )
+	Used by writeDot
 
-	In: n is an integer
-		xi is a probability distribution on the integers
-		(must be able to calculate the probabilities of
-		multiple integers at once),
-		max is an integer (default max =  999).
+	s = dotId( x )
 
-	Out: N is a Multinomial(n,P) random vector (except the
-		trailing zeroes have been trimmed), where P is
-		a vector of length max+1 such that P[i] = xi(i)
-		for i in {0, ..., max - 1} and P[max] = 1 - sum(P).
+	Out: s is x as an ID in the DOT language.
 
 	'''
 
-	P = xi( np.arange( max + 1. ) )
+	if isinstance( x, ( int, long, np.integer ) ):
 
-	N = np.random.multinomial( n, P )
+		return str(x)
 
-	return np.trim_zeros( N, 'b' )
+	return '"%s"' % str(x).replace( '"', '\\"' )
 
 
 
 
-def saveGraph( G, filename, draw = True, write = False, prog = 'neato' ):
+def dotAttributes( attributes ):
 	'''
 
-	saveGraph( G, filename, draw, write, prog )
+	Used by writeDot
 
-	In: G is a graph (networkx.Graph)
-		filename is a string
-		draw, write are boolean (default True, False)
+	s = dotAttributes( attributes )
 
-	UT: If prog is one of
-		'neato','dot','twopi','circo','fdp','nop'
-		then the graph, G, gets the layout prog and:
+	Out: s is the dictionary attributes as an attribute list
+		in the DOT language, e.g. ' [color="red"]', or '' if
+		attributes is empty.
 
-			If draw == True, then an image of the graph
-			is saved in filename.png.
-			Else, if draw == False, no image is saved.
+	'''
 
-			If write == True, the graph is saved
-			in text format in filename.dot.
+	if not attributes:
 
-		Else, if prog is not on the list,
-		the graph gets no particular layout and:
+		return ''
 
-			No image of the graph is saved.
+	return ' [%s]' % ', '.join([ '%s=%s' % ( key, dotId( str(value) ) )
+									for key, value in attributes.items() ])
 
-			If write == True, the graph is saved
-			in text format in filename.dot.
 
+
+
+def writeDot( G, filename, chunk = 2**16 ):
 	'''
 
-	progValid = prog in [ 'neato', 'dot', 'twopi', 'circo', 'fdp', 'nop' ]
+	Used by saveGraph
 
-	if draw and not progValid:
-		# Print warning if draw and progValid disagree.
+	writeDot( G, filename, chunk )
 
-		print 'WARNING: prog = ' + prog \
-			+ ' is not one of neato|dot|twopi|circo|fdp|nop.' \
-			+ '\n\tNothing is drawn.'
+	Out: G has been written to filename.dot in the DOT language,
+		without a layout, like saveGraph( G, filename, draw = False,
+		write = True, prog = None ) but directly from the arrays of
+		G (see edgeArrays) and chunk lines at a time.
 
-		draw = False
+		The style rules of G (see addStyle) are written as attributes
+		(a rule for all nodes becomes a default node attribute), as
+		are the vectors in G.data of a planeTree.PlaneTree, the root
+		edge of a planarMap.PlanarMap and the attributes of the
+		vertices and edges of a networkx.Graph.
 
+	'''
 
-	# Convert the graph from networkx.Graph
-	# to pygraphviz.AGraph
-	H = nx.nx_agraph.to_agraph( G )
+	source, target, names = edgeArrays( G )
 
+	number = dict( zip( names, range( len(names) ) ) )
 
-	if progValid:
 
-		print '\tLayout...'
+	# The attributes of the vertices and edges, in the numbering of
+	# edgeArrays, which are not the same for all of them.
+	nodeAttributes = {}
 
-		H.layout(prog=prog)
+	edgeAttributes = {}
 
-	if draw:
+	# The vectors in G.data, which are added to the attributes
+	# of the vertices while they are written.
+	data = getattr( G, 'data', {} )
 
-		print '\tDraw %s.png...' % filename
+	if hasattr( G, 'source' ):
 
-		H.draw(filename + '.png')
+		edgeAttributes[ G.rootEdge ] = { 'awayFrom': G.name( G.awayFrom ) }
 
-	if write:
+	elif not hasattr( G, 'offsets' ):
 
-		print '\tWrite %s.dot...' % filename
+		for v, attributes in G.nodes( data = True ):
 
-		H.write(filename + '.dot')
+			if attributes:
 
+				nodeAttributes[ number[v] ] = dict( attributes )
+
+		for i, ( u, v, attributes ) in enumerate( G.edges( data = True ) ):
+
+			if attributes:
+
+				edgeAttributes[i] = dict( attributes )
+
+
+	# The style rules, in the same order as in applyStyle.
+	default = {}
+
+	for attribute, value, nodes, edges in G.graph.get( 'styleRules', [] ):
+
+		if edges is not None:
+
+			for e in edges:
+
+				u = number[ e[0] ]
+
+				v = number[ e[1] ]
+
+				i = np.flatnonzero( ( ( source == u ) & ( target == v ) ) |
+									( ( source == v ) & ( target == u ) ) )
+
+				i = i[ e[2] if len(e) == 3 else 0 ]
+
+				edgeAttributes.setdefault( i, {} )[attribute] = value
+
+			continue
+
+
+		if nodes is None:
+
+			# The rule overrides everything before it.
+			default[attribute] = value
+
+			for attributes in nodeAttributes.values():
+
+				attributes.pop( attribute, None )
+
+			data = dict( ( key, data[key] ) for key in data if key != attribute )
+
+			continue
+
+		elif hasattr(nodes,'__call__'):
+
+			nodes = nodes( G )
+
+
+		for v in nodes:
+
+			nodeAttributes.setdefault( number[v], {} )[attribute] = value
+
+
+	print '\tWrite %s.dot...' % filename
+
+	with open( filename + '.dot', 'w' ) as f:
+
+		f.write( 'graph {\n' )
+
+		if default:
+
+			f.write( '\tnode%s;\n' % dotAttributes( default ) )
+
+		for a in range( 0, len(names), chunk ):
+
+			b = min( a + chunk, len(names) )
+
+			values = dict( ( key, data[key][a:b].tolist() ) for key in data )
+
+			lines = []
+
+			for v in range( a, b ):
+
+				attributes = dict( ( key, values[key][ v - a ] ) for key in values )
+
+				attributes.update( nodeAttributes.get( v, {} ) )
+
+				lines.append( '\t%s%s;\n' % ( dotId( names[v] ),
+												dotAttributes( attributes ) ) )
+
+			f.write( ''.join( lines ) )
+
+		for a in range( 0, len(source), chunk ):
+
+			f.write( ''.join([ '\t%s -- %s%s;\n' % ( dotId( names[u] ),
+						dotId( names[v] ), dotAttributes( edgeAttributes.get( i ) ) )
+						for i, u, v in zip( range( a, a + chunk ),
+											source[ a : a + chunk ].tolist(),
+											target[ a : a + chunk ].tolist() ) ]) )
+
+		f.write( '}\n' )
 
-	return
 
 
 
@@ -225,12 +1263,14 @@ def childrenOf( parent, T, grandParent = None ):
 
 	'''
 
+	import networkx as nx
+
 	children = []
 
 
 	for v in nx.all_neighbors(T,parent):
 
-		if not v is grandParent:
+		if v != grandParent:
 
 			children.append(v)
 
@@ -239,6 +1279,184 @@ def childrenOf( parent, T, grandParent = None ):
 
 
 
+def csrAdjacency( G ):
+	'''
+
+	offsets, indices, nodes = csrAdjacency( G )
+
+	In: G is a connected graph (networkx.Graph, planeTree.PlaneTree
+		or planarMap.PlanarMap).
+
+	Out: The vertices of G are numbered 0, 1, ..., N-1 in the
+		order of nodes (G.nodes(), or 0, 1, ..., N-1 for a
+		PlaneTree or a PlanarMap) and the neighbours of vertex number v are
+		indices[ offsets[v] : offsets[v+1] ].
+
+	'''
+
+	if hasattr( G, 'csr' ):
+
+		offsets, indices = G.csr()
+
+		return offsets, indices, range( len(G) )
+
+
+	if hasattr( G, 'offsets' ):
+
+		# A planeTree.PlaneTree, each edge is listed from both ends.
+		n = len(G)
+
+		ends = np.concatenate([ G.parent[1:], np.arange( 1, n ) ])
+
+		other = np.concatenate([ np.arange( 1, n ), G.parent[1:] ])
+
+		offsets = np.zeros( n + 1, dtype = np.int64 )
+
+		np.cumsum( np.bincount( ends, minlength = n ), out = offsets[1:] )
+
+		return offsets, other[ np.argsort( ends, kind = 'mergesort' ) ], range(n)
+
+
+	nodes = list( G.nodes() )
+
+	number = dict( zip( nodes, range( len(nodes) ) ) )
+
+	degrees = [ len( G[v] ) for v in nodes ]
+
+	offsets = np.zeros( len(nodes) + 1, dtype = np.int64 )
+
+	np.cumsum( degrees, out = offsets[1:] )
+
+	indices = np.array([ number[u] for v in nodes for u in G[v] ], dtype = np.int64 )
+
+	return offsets, indices, nodes
+
+
+
+
+def bfsDistances( offsets, indices, origins ):
+	'''
+
+	dist = bfsDistances( offsets, indices, origins )
+
+	In: offsets, indices is the adjacency of a graph G
+		(see csrAdjacency).
+		origins is a vertex in G or a list of k vertices.
+
+	Out: dist is an int32 vector such that dist[v] is the length
+		of the shortest path from origins to v, or -1 if there is
+		no such path. If origins is a list, dist is a k x N array
+		and dist[i] are the distances from origins[i].
+
+	A single search is done one generation at a time with array
+	operations. The searches from a list of origins are done 64
+	at a time: Bit i of visited[v] and frontier[v] tells if the
+	search from origin i has reached v, so one pass over the
+	edges advances all 64 searches by one generation.
+
+	'''
+
+	N = len(offsets) - 1
+
+	if np.ndim( origins ) == 0:
+
+		dist = np.full( N, -1, dtype = np.int32 )
+
+		dist[origins] = 0
+
+		frontier = np.array( [ origins ] )
+
+		level = 0
+
+		while len(frontier) > 0:
+
+			# All the neighbours of the frontier.
+			start = offsets[frontier]
+
+			count = offsets[ frontier + 1 ] - start
+
+			first = np.cumsum( count ) - count
+
+			neighbours = indices[ np.repeat( start - first, count ) +
+									np.arange( count.sum() ) ]
+
+			frontier = np.unique( neighbours[ dist[neighbours] == -1 ] )
+
+			level += 1
+
+			dist[frontier] = level
+
+		return dist
+
+
+	origins = np.asarray( origins )
+
+	dist = np.full( ( len(origins), N ), -1, dtype = np.int32 )
+
+	# The vertices without neighbours, where reduceat does not give
+	# an empty union. (A zero is added after the neighbours of the
+	# last vertex so that offsets[:-1] are valid indices.)
+	isolated = offsets[:-1] == offsets[1:]
+
+	starts = offsets[:-1]
+
+	values = np.zeros( len(indices) + 1, dtype = np.uint64 )
+
+	# unpackbits gives the bits of each byte from the highest.
+	bit = ( 8 * ( np.arange( 64 ) // 8 ) + 7 - np.arange( 64 ) % 8 )
+
+	for a in range( 0, len(origins), 64 ):
+
+		batch = origins[ a : a + 64 ]
+
+		bits = np.left_shift( np.uint64(1),
+								np.arange( len(batch), dtype = np.uint64 ) )
+
+		frontier = np.zeros( N, dtype = np.uint64 )
+
+		np.bitwise_or.at( frontier, batch, bits )
+
+		visited = frontier.copy()
+
+		dist[ a + np.arange( len(batch) ), batch ] = 0
+
+		level = 0
+
+		while frontier.any():
+
+			# new[v] is the union of frontier[u] over the
+			# neighbours u of v, without the searches at v.
+			np.take( frontier, indices, out = values[:-1] )
+
+			new = np.bitwise_or.reduceat( values, starts )
+
+			new[isolated] = 0
+
+			new &= ~visited
+
+			visited |= new
+
+			frontier = new
+
+			level += 1
+
+			reached = np.flatnonzero( new )
+
+			# The bits of new[reached] as a matrix, column j
+			# is bit number bit[j].
+			B = np.unpackbits( new[reached].astype( '<u8' ).view( np.uint8 )
+								.reshape( -1, 8 ), axis = 1 )
+
+			r, j = np.nonzero( B )
+
+			dist[ a + bit[j], reached[r] ] = level
+
+
+	return dist
+
+
+
+
 def markDistance( G, origin, copy = False ):
 	'''
 
@@ -258,6 +1476,9 @@ def markDistance( G, origin, copy = False ):
 		Else if copy == False, then H is the same
 		object as G and thus, G has been altered.
 
+	The distances are found by bfsDistances, use it directly
+	if the distances are not needed on the vertices of G.
+
 	'''
 
 	if copy:
@@ -268,32 +1489,13 @@ def markDistance( G, origin, copy = False ):
 
 		H = G
 
-	# Initialise all labels.
-	Labels = dict(zip( H.nodes(), [-1] * len(H) ))
-
-	nx.set_node_attributes( H, 'label', Labels )
+	offsets, indices, nodes = csrAdjacency( H )
 
-	H.node[origin][ 'label' ] = 0
+	dist = bfsDistances( offsets, indices, nodes.index( origin ) )
 
+	import networkx as nx
 
-	Q = Queue.Queue( maxsize = len(G) )
-	Q.put( origin )
-
-
-	# Perform breadth first search to learn
-	# all distances to origin.
-	while not Q.empty():
-
-		u = Q.get()
-
-		for v in nx.all_neighbors(G,u):
-
-			if H.node[v]['label'] < 0:
-				# Hofum fundid nyjan hnut.
-
-				H.node[v]['label'] = H.node[u]['label'] + 1
-
-				Q.put( v )
+	nx.set_node_attributes( H, dict( zip( nodes, dist.tolist() ) ), 'label' )
 
 	return H
 
@@ -310,6 +1512,8 @@ def sampleTree():
 
 	'''
 
+	import networkx as nx
+
 	T = nx.Graph()
 
 	T.add_nodes_from( range(23) )
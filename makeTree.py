@@ -10,34 +10,45 @@
 #
 # Packages:
 # numpy:		For computation.
-# scipy.stats:	For probability distributions.
-# networkx:		Graphs.
 
 import numpy as np
-import scipy.stats as scistats
-import networkx as nx
 
 import graphUtil
+import planeTree
 
 
 
-def createXi( xi, n, maxiter = 9999 ):
+def createXi( xi, n, maxiter = 9999, batch = False, returnTrials = False,
+				verbose = True ):
 	'''
 
-	Xi = createXi( xi, n )
+	Xi = createXi( xi, n, maxiter, batch, returnTrials, verbose )
 
 	In: n is an integer
 		xi is a probability distribution on the integers
 		(must be able to calculate the probabilities of
-		multiple integers at once),
+		multiple integers at once, e.g. a graphUtil.Distribution),
 		OR xi is a vector (list, numpy.ndarray, ...)
 		such that sum(xi) = 1,
-		maxiter is an integer (default maxiter = 999)
+		maxiter is an integer (default maxiter = 9999)
+		batch, returnTrials, verbose are boolean
+		(default False, False, True)
 
 	Out: Xi is a random vector such that Xi[i] ~ xi for all i
 		and sum(Xi) = n - 1.
 		The program crashes if the number of trials exceeds maxiter.
 
+		If batch == True, the multinomial trials are drawn in blocks
+		by makeTree.batchTrials instead of one at a time.
+
+		If returnTrials == True, then ( Xi, trials, tail ) is
+		returned, where trials is the number of multinomial vectors
+		that were tested and tail is the probability mass of xi that
+		was lumped into the last entry of the multinomial vectors
+		(see graphUtil.multinomial, 0 if xi is a vector).
+
+		If verbose == True, then the number of trials is printed.
+
 	The algorithm is described in 'Simulating size-constrained
 	Galton-Watson trees' by Luc Devroye.
 
@@ -46,6 +57,56 @@ def createXi( xi, n, maxiter = 9999 ):
 
 	'''
 
+	if batch:
+
+		N, trials = batchTrials( xi, n, maxiter )
+
+	else:
+
+		N, trials = singleTrials( xi, n, maxiter )
+
+
+	if verbose:
+
+		print '\t%d trials' % trials
+
+
+	Xi = rotateCounts( N, n )
+
+	if returnTrials:
+
+		# The tail of the same (cached) table that the trials
+		# were drawn from.
+		if hasattr(xi,'__call__'):
+
+			tail = graphUtil.pmfTable( xi, n )[1]
+
+		else:
+
+			tail = 0.
+
+		return Xi, trials, float( tail )
+
+	return Xi
+
+
+
+
+def singleTrials( xi, n, maxiter ):
+	'''
+
+	Used by createXi
+
+	N, trials = singleTrials( xi, n, maxiter )
+
+	In: xi, n and maxiter are as in createXi.
+
+	Out: N is the first Multinomial(n,xi) vector such that
+		sum( j*N[j] ) == n-1 and trials is the number of vectors drawn.
+		Raises RuntimeError if trials exceeds maxiter.
+
+	'''
+
 	# Check if xi is a probability distribution,
 	# or else a vector of probabilities.
 	if hasattr(xi,'__call__'):
@@ -73,7 +134,7 @@ def createXi( xi, n, maxiter = 9999 ):
 		# If not, then we try again.
 		if ( np.arange(K) * N ).sum() == n-1:
 
-			break
+			return N, trials
 
 		if trials >= maxiter:
 
@@ -83,97 +144,339 @@ def createXi( xi, n, maxiter = 9999 ):
 								' probability distribution.')
 
 
-	print '\t%d trials' % trials
 
 
-	# Create a vector with N[j] copies of j
-	# for j = 0, ..., K-1 and permute it randomly.
-	Xi = np.concatenate([ j * np.ones( N[j] ) for j in range(K) ])
-	Xi = np.random.permutation( Xi )
+def batchTrials( xi, n, maxiter, minBlock = 16, maxEntries = 2**22 ):
+	'''
 
-	# Random walk, page 5.
+	Used by createXi
 
-	S = 1	# S_0
-	minS = 1
-	index = 0
+	N, trials = batchTrials( xi, n, maxiter, minBlock, maxEntries )
 
-	for t in range( n - 1 ):
-		# S_t = S_(t-1) + Xi[t] - 1
-		# minS_t = min{r <= t: S_r} = S_index
+	In: xi, n and maxiter are as in createXi.
+		minBlock, maxEntries are integers (default 16, 2^22).
 
-		S = S + Xi[t+1] - 1 # S_(t+1)
+	Out: The same as singleTrials, except that the multinomial vectors
+		are drawn a block at a time and tested all at once. trials
+		counts the vectors up to and including the accepted one, so
+		it is comparable with singleTrials.
 
-		if S < minS:
+		After t failed trials the acceptance rate is at most about
+		1/t, so the next block has about t vectors (at least minBlock),
+		i.e. the block size doubles until a vector is accepted.
+		A block never holds more than maxEntries integers.
 
-			minS = S		#minS_(t+1)
+	'''
 
-			index = t + 1
+	if hasattr(xi,'__call__'):
 
+		Multinom = lambda m,zeta,B: graphUtil.multinomial( m, zeta, size = B )
 
-	# Rotate Xi such that the random walk ends at 0.
-	Xi = np.roll( Xi, -index - 1 )
+	else:
 
-	return Xi.astype( int )
+		Multinom = lambda m,P,B: np.random.multinomial( m, P, size = B )
 
 
+	trials = 0
 
+	block = minBlock
 
-def makeTree( Xi ):
+	while trials < maxiter:
+
+		block = min( block, maxiter - trials )
+
+		N = Multinom( n, xi, block )
+
+		K = N.shape[1]
+
+		# Test all the vectors in the block at once.
+		accepted = np.flatnonzero( N.dot( np.arange(K) ) == n-1 )
+
+		if len(accepted) > 0:
+
+			first = accepted[0]
+
+			return N[first], trials + first + 1
+
+		trials += block
+
+		# Adapt the block size to the acceptance rate
+		# observed so far and the width of the vectors.
+		block = max( 1, min( max( minBlock, trials ), maxEntries // K ) )
+
+
+	raise RuntimeError('Maximum number of trials reached' +\
+						' (%d). ' % maxiter +\
+						'Try again or choose another' +\
+						' probability distribution.')
+
+
+
+
+def createXiExact( xi, n ):
 	'''
 
-	T = makeTree( Xi )
+	Xi = createXiExact( xi, n )
 
-	In: Xi is a list (list, numpy.ndarray,...) of n integers.
+	In: n is an integer
+		xi is as in createXi.
 
-	Out: T is a tree (networkx.Graph) with vertices 0, 1, ..., n-1,
-		such that vertex number j has Xi[j] children (0 is the root).
+	Out: Xi is a random vector with the same distribution as
+		the output of createXi( xi, n ), but it is sampled
+		without rejection by makeTree.exactCounts.
 
 	'''
 
-	n = len(Xi)
+	return rotateCounts( exactCounts( xi, n ), n )
 
-	T = nx.Graph()
 
-	# Start with the root.
-	T.add_node( 0 )
-	node_count = 1
 
 
-	for parent in range(n):
-		# The vertex parent has Xi[parent] children,
-		# whose numbers are node_count, node_count + 1, ...
-		#			..., node_count + Xi[parent] - 1
+def exactCounts( xi, n, tol = 1e-13 ):
+	'''
 
-		children = range( node_count, node_count + Xi[parent] )
+	N = exactCounts( xi, n, tol )
 
-		node_count = node_count + Xi[parent]
+	In: n is an integer
+		xi is as in createXi.
+		tol is a small positive number (default 1e-13).
+
+	Out: N is a Multinomial(n,xi) random vector conditioned on
+		sum( j*N[j] ) == n-1, i.e. N[j] is the number of vertices
+		with j children in a xi-Galton-Watson tree conditioned
+		on having n vertices.
+		Raises ValueError if there is no such tree.
+
+	A vertex has at most n-1 children, so only xi(0), ..., xi(n-1)
+	matter and xi can be taken to have finite support.
+
+	The conditioned distribution does not change if xi is replaced
+	by an equivalent (tilted) distribution, so xi is first tilted to
+	have expected value (n-1)/n. Then the n offspring numbers are
+	split recursively into two halves, and the sum of the first
+	half is drawn from its exact conditional distribution
+	P( S_a = s | S_(a+b) = t ) ~ P( S_a = s ) * P( S_b = t - s ),
+	where the distributions of the partial sums S_m are convolution
+	powers of xi. Halves with the same size and sum are handled
+	together, so only a few convolution powers are needed and the
+	running time does not depend on the expected value of xi.
+
+	Probabilities that are less than tol times the largest
+	probability of a convolution power are set to zero, to get rid
+	of rounding errors from the Fourier transform.
 
-		# Add the children to the tree and connect to parent.
-		T.add_nodes_from(children)
+	'''
 
-		for child in children:
+	if hasattr(xi,'__call__'):
 
-			T.add_edge(parent,child)
+		p = xi( np.arange( n + 0. ) )
 
+	else:
 
-	# Adjust look
-	Point = dict(zip( T.nodes(), ['point'] * len(T) ))
-	Red =   dict(zip( T.nodes(), ['red'] * len(T) ))
-	Blank = dict(zip( T.nodes(), [' '] * len(T) ))
+		p = np.array( xi[:n], dtype = float )
+
+
+	p = np.trim_zeros( p / p.sum(), 'b' )
+
+	K = len(p)
+
+	if p[0] == 0 or ( K == 1 and n > 1 ):
+
+		raise ValueError('There is no tree with %d vertices' % n +\
+							' and this offspring distribution.')
+
+	if n == 1:
+
+		return np.array([ 1 ])
+
+
+	p = graphUtil.equivalentWeights( p, mean = ( n - 1. ) / n )
+
+
+	# powers[m][s] == P( S_m = s ) for s = 0, ..., n-1
+	powers = { 1: convolutionTrim( p, [1.], n, tol ) }
+
+	def power( m ):
+
+		if not m in powers:
+
+			powers[m] = convolutionTrim( power( m // 2 ),
+										power( m - m // 2 ), n, tol )
+
+		return powers[m]
+
+
+	if power( n )[n-1] == 0:
+
+		raise ValueError('There is no tree with %d vertices' % n +\
+							' and this offspring distribution.')
+
+
+	N = np.zeros( K, dtype = int )
+
+	# level[(m,t)] is the number of blocks of m offspring numbers
+	# that sum to t.
+	level = { ( n, n - 1 ): 1 }
 
-	nx.set_node_attributes( T, Point, 'shape' )
-	nx.set_node_attributes( T, Red, 'color' )
-	nx.set_node_attributes( T, Blank, 'label' )
+	while level:
+
+		nextLevel = {}
+
+		for (m, t), c in level.items():
+
+			if m == 1:
+
+				N[t] += c
+
+				continue
+
+			a = m // 2
+			b = m - a
+
+			Pa = power( a )
+			Pb = power( b )
+
+			# The possible sums s of the first half.
+			low = max( 0, t - len(Pb) + 1 )
+			high = min( t, len(Pa) - 1 )
+
+			s = np.arange( low, high + 1 )
+
+			P = Pa[s] * Pb[t - s]
+
+			counts = np.random.multinomial( c, P / P.sum() )
+
+			for i in np.flatnonzero( counts ):
+
+				for key in [ ( a, s[i] ), ( b, t - s[i] ) ]:
+
+					nextLevel[key] = nextLevel.get( key, 0 ) + counts[i]
+
+		level = nextLevel
+
+
+	return N
+
+
+
+
+def convolutionTrim( P, Q, n, tol ):
+	'''
+
+	Used by exactCounts
+
+	R = convolutionTrim( P, Q, n, tol )
+
+	In: P and Q are vectors of non-negative numbers.
+		n is an integer and tol is a small positive number.
+
+	Out: R is the convolution of P and Q, truncated to length n,
+		with entries less than tol * max(R) set to zero.
+		Long vectors are convolved with the fast Fourier transform.
+
+	'''
+
+	L = len(P) + len(Q) - 1
+
+	if len(P) * len(Q) <= 2**16:
+
+		R = np.convolve( P, Q )
+
+	else:
+
+		size = 2 ** int( np.ceil( np.log2( L ) ) )
+
+		R = np.fft.irfft( np.fft.rfft( P, size ) * np.fft.rfft( Q, size ),
+							size )[:L]
+
+	R = R[:n]
+
+	R[ R < tol * R.max() ] = 0
+
+	return R
+
+
+
+
+def rotateCounts( N, n ):
+	'''
+
+	Xi = rotateCounts( N, n )
+
+	In: N is a vector of non-negative integers such that
+		sum(N) == n and sum( j*N[j] ) == n - 1.
+
+	Out: Xi is an integer vector (numpy.ndarray) of length n
+		containing N[j] copies of j for each j, in uniformly random
+		order, cyclically rotated such that it is the offspring
+		sequence of a tree, listed in breadth first order.
+
+	The rotation is the cyclic lemma, see page 5 of 'Simulating
+	size-constrained Galton-Watson trees' by Luc Devroye.
+	Everything is done with array operations, so this scales like
+	numpy and not like a python loop over the vertices.
+
+	'''
+
+	# Smallest integer type that can hold the vertex numbers.
+	if n < 2**31:
+		dtype = np.int32
+	else:
+		dtype = np.int64
+
+	# Create a vector with N[j] copies of j
+	# for j = 0, ..., K-1 and permute it randomly.
+	Xi = np.repeat( np.arange( len(N), dtype = dtype ), N )
+	Xi = np.random.permutation( Xi )
+
+	# Random walk, page 5.
+	# S_t = 1 + sum_{r = 1}^{t} ( Xi[r] - 1 ), so walk[t-1] = S_t - 1.
+	walk = np.cumsum( Xi[1:] - 1 )
+
+	# The rotation index is the first t where S_t attains its minimum,
+	# or 0 if the walk never goes below S_0 = 1.
+	index = 0
+
+	if len(walk) > 0 and walk.min() < 0:
+
+		index = np.argmin( walk ) + 1
+
+
+	# Rotate Xi such that the random walk ends at 0.
+	return np.roll( Xi, -index - 1 )
+
+
+
+
+def makeTree( Xi ):
+	'''
+
+	T = makeTree( Xi )
+
+	In: Xi is a list (list, numpy.ndarray,...) of n integers.
+
+	Out: T is a tree (planeTree.PlaneTree) with vertices 0, 1, ..., n-1,
+		such that vertex number j has Xi[j] children (0 is the root).
+		T.to_networkx() is the same tree as a networkx.Graph.
+
+	'''
+
+	T = planeTree.PlaneTree( Xi )
+
+	# Adjust look
+	graphUtil.addStyle( T, 'shape', 'point' )
+	graphUtil.addStyle( T, 'color', 'red' )
+	graphUtil.addStyle( T, 'label', ' ' )
 
 	return T
 
 
 
 
-def generateTree( xi, n ):
+def generateTree( xi, n, method = 'multinomial', verbose = True ):
 	'''
 
-	T = generateTree( xi, n ):
+	T = generateTree( xi, n, method, verbose ):
 
 	In: n is an integer
 		xi is a probability distribution on the integers
@@ -181,15 +484,36 @@ def generateTree( xi, n ):
 		multiple integers at once),
 		OR xi is a vector (list, numpy.ndarray, ...)
 		such that sum(xi) = 1,
-		maxiter is an integer (default maxiter = 999)
+		method is one of 'multinomial', 'batch', 'exact'
+		(default 'multinomial'), verbose is passed on to createXi
+		(default True).
 
-	Out: T is a tree (networkx.Graph) with vertices 0, 1, ..., n-1,
+	Out: T is a tree (planeTree.PlaneTree) with vertices 0, 1, ..., n-1,
 		and xi as offspring distribution.
 		P(k children) = xi(k)
 
+		The offspring numbers are drawn by...
+			... createXi if method == 'multinomial'.
+			... createXi with batch = True if method == 'batch'.
+			... createXiExact if method == 'exact'.
+
 	'''
 
-	Xi = createXi( xi, n )
+	if method == 'multinomial':
+
+		Xi = createXi( xi, n, verbose = verbose )
+
+	elif method == 'batch':
+
+		Xi = createXi( xi, n, batch = True, verbose = verbose )
+
+	elif method == 'exact':
+
+		Xi = createXiExact( xi, n )
+
+	else:
+
+		raise ValueError('Unknown method: %s' % method)
 
 	return makeTree( Xi )
 
@@ -237,7 +561,7 @@ def main():
 	# Probability distribution xi, should have expected
 	# value around 1.
 	# Can be defined as a function...
-	#xi = lambda x: scistats.geom.pmf(x+1,0.5)
+	#xi = lambda x: 0.5 ** ( x + 1. )
 
 	# ...or as a vector.
 	w = [572,1,2,3,4,5,6,7,8,9,10,11,12]
@@ -14,10 +14,9 @@
 
 
 import sys
+import multiprocessing
 import numpy as np
-import scipy.stats as scistats
 import Queue
-import networkx as nx
 import graphUtil, makeTree, treeToMobile, bdg
 
 
@@ -41,6 +40,8 @@ def isUniverse( G, alpha, d ):
 	'''
 
 
+	import networkx as nx
+
 	dist = dict( zip( G.nodes(), [-1] * len(G) ) )
 
 	# d(alpha,alpha) = 0
@@ -97,55 +98,422 @@ def isUniverse( G, alpha, d ):
 # ---------------------------------------------
 # ---------------------------------------------
 
+def eccentricity( offsets, indices, alpha, dist = None ):
+	'''
 
-# Oddatala
-n = 101
+	e, omega = eccentricity( offsets, indices, alpha, dist )
 
-w = [1,0,1]
+	In: offsets, indices is the adjacency of a connected graph
+		G (see graphUtil.csrAdjacency) and alpha is a vertex in G.
+		dist is None (default) or an integer vector with an
+		element for each vertex, in which case the distances
+		from alpha are written into dist.
 
-xi = 1. * np.array(w) / sum(w) 
+	Out: e is the eccentricity of alpha (the largest distance
+		from alpha). omega is the vertex at distance e from alpha
+		if it is the only local maximum of the distance from alpha
+		(every other vertex has a neighbour further away),
+		otherwise omega == -1.
 
-mob_lab = 1
+		So G is a universe with beginning alpha and end omega,
+		isUniverse( G, alpha, d ) == omega, if and only if
+		omega != -1 and e is the diameter d of G.
 
-# ---------------------------------------------
-# ---------------------------------------------
+	The breadth first search is done one generation (all the
+	vertices at the same distance) at a time with array operations.
 
-#print 'Make tree...'
-T = makeTree.generateTree(xi,n)
+	'''
 
-#print 'Map to mobile...'
-M = treeToMobile.treeToMobile( T, mob_lab )
+	if dist is None:
 
-#print 'Map to planar...'
-G = bdg.mobileToGraph( M, graphUtil.coin() )
+		dist = np.empty( len(offsets) - 1, dtype = np.int32 )
 
+	dist[:] = -1
 
-# ---------------------------------------------
-# ---------------------------------------------
+	dist[alpha] = 0
 
+	frontier = np.array( [ alpha ] )
 
-#graphUtil.saveGraph( G, 'maxim', draw = True, write = False, prog = 'fdp' )
+	e = 0
 
+	isUniverse = True
 
-Nodes = G.nodes()
+	while True:
 
-d = nx.diameter(G)
+		# All the neighbours of the vertices in the frontier,
+		# owner[k] is the index in frontier of the k-th neighbour.
+		start = offsets[frontier]
 
-count = 0
+		count = offsets[ frontier + 1 ] - start
 
+		owner = np.repeat( np.arange( len(frontier) ), count )
 
-# Skodum alla hnuta i G og vitum hvort their myndi upphof.
-for u in Nodes:
+		first = np.cumsum( count ) - count
+
+		neighbours = indices[ np.repeat( start - first, count ) +
+								np.arange( len(owner) ) ]
+
+		new = neighbours[ dist[neighbours] == -1 ]
+
+		if len(new) == 0:
+
+			break
+
+		frontier = np.unique( new )
+
+		e += 1
+
+		dist[frontier] = e
+
+		# A vertex without a neighbour in the next generation
+		# is a local maximum which is not at the largest distance.
+		further = np.bincount( owner[ dist[neighbours] == e ],
+								minlength = len(count) )
+
+		if isUniverse and ( further == 0 ).any():
+
+			isUniverse = False
+
+
+	if isUniverse and len(frontier) == 1:
+
+		return e, int( frontier[0] )
+
+	return e, -1
+
+
+
+
+def boundingDiameter( offsets, indices ):
+	'''
+
+	d, lower, upper, searches = boundingDiameter( offsets, indices )
+
+	In: offsets, indices is the adjacency of a connected graph
+		G (see graphUtil.csrAdjacency).
+
+	Out: d is the diameter of G. lower[v] <= e(v) <= upper[v] are
+		bounds on the eccentricity e(v) of each vertex v, and
+		searches is a dictionary such that searches[v] is
+		eccentricity( offsets, indices, v ) for each vertex v
+		where a breadth first search was done.
+
+	The diameter is found as in 'Computing the eccentricity
+	distribution of large graphs' by F. W. Takes and W. A. Kosters:
+	A search from v gives e(v) and the distances d(v,w), and
+
+		max( d(v,w), e(v) - d(v,w) ) <= e(w) <= e(v) + d(v,w).
+
+	The diameter lies between the largest lower bound and the largest
+	upper bound. Vertices whose bounds can not change these are
+	discarded, and the next search is from the remaining vertex with
+	the largest upper bound or, in turn, the smallest lower bound
+	(the periphery and the center of G) until the bounds meet.
+	Usually only a few searches are needed instead of one for
+	each vertex.
+
+	'''
+
+	N = len(offsets) - 1
+
+	degree = np.diff( offsets )
+
+	lower = np.zeros( N, dtype = np.int64 )
+
+	upper = np.full( N, N, dtype = np.int64 )
+
+	# The vertices whose searches might improve the bounds.
+	isCandidate = np.ones( N, dtype = bool )
+
+	dist = np.empty( N, dtype = np.int32 )
+
+	searches = {}
+
+	dLower = 0
+
+	dUpper = N
+
+	high = True
+
+	while dLower < dUpper and isCandidate.any():
+
+		candidates = np.flatnonzero( isCandidate )
+
+		# Among the candidates with the best bound, take one
+		# with the largest degree.
+		if high:
+
+			bound = upper[candidates]
+
+			best = candidates[ bound == bound.max() ]
+
+		else:
+
+			bound = lower[candidates]
+
+			best = candidates[ bound == bound.min() ]
+
+		v = int( best[ np.argmax( degree[best] ) ] )
+
+		high = not high
+
+
+		searches[v] = eccentricity( offsets, indices, v, dist )
+
+		e = searches[v][0]
+
+		lower = np.maximum( lower, np.maximum( dist, e - dist ) )
+
+		upper = np.minimum( upper, e + dist )
+
+		dLower = max( dLower, int( lower.max() ) )
+
+		dUpper = min( dUpper, int( upper.max() ) )
+
+		isCandidate[v] = False
+
+		isCandidate &= ( lower != upper ) & \
+						~( ( upper <= dLower ) & ( 2 * lower >= dUpper ) )
+
+
+	return dLower, lower, upper, searches
+
+
+
+
+# The adjacency of the graph in the worker processes of universeCount,
+# in shared memory.
+sharedAdjacency = None
+
+
+def shareAdjacency( offsets, indices, dtype ):
+	'''
+
+	Used by universeCount
+
+	shareAdjacency( offsets, indices, dtype )
+
+	Out: sharedAdjacency is the adjacency stored in the shared
+		arrays offsets and indices (of type dtype), without a copy.
+
+	'''
+
+	global sharedAdjacency
+
+	sharedAdjacency = ( np.frombuffer( offsets, dtype = dtype ),
+						np.frombuffer( indices, dtype = dtype ) )
+
+
+
+
+def eccentricities( alphas, adjacency = None ):
+	'''
+
+	E, Omega = eccentricities( alphas, adjacency )
+
+	In: alphas is a list of vertices in a graph G.
+		adjacency is ( offsets, indices ) (see graphUtil.csrAdjacency),
+		or None for sharedAdjacency.
+
+	Out: E[k], Omega[k] == eccentricity( offsets, indices, alphas[k] )
+
+	'''
+
+	if adjacency is None:
+
+		adjacency = sharedAdjacency
+
+	offsets, indices = adjacency
+
+	E = np.zeros( len(alphas), dtype = np.int32 )
+
+	Omega = np.zeros( len(alphas), dtype = np.int64 )
+
+	for k, alpha in enumerate( alphas ):
+
+		E[k], Omega[k] = eccentricity( offsets, indices, alpha )
+
+	return E, Omega
+
+
+
+
+def universeCount( G, processes = None, chunk = 64, prune = True ):
+	'''
+
+	count, d = universeCount( G, processes, chunk, prune )
+
+	In: G is a connected graph (networkx.Graph or
+		planarMap.PlanarMap).
+		processes is the number of worker processes (default
+		None, for the number of CPUs), 1 for no workers.
+		chunk is the number of vertices in each task (default 64).
+		prune is a boolean (default True).
+
+	Out: d is the diameter of G and count is the number of
+		alpha-omega pairs, counted as follows: The vertices u are
+		considered in order and if G is a universe with beginning
+		u and end v (see isUniverse), then count is increased by one
+		and v is not considered as a beginning later on.
+
+	The eccentricity of every vertex is found with a breadth first
+	search (see eccentricity) and the searches are spread over a
+	pool of processes. The adjacency of G is put in shared memory
+	once instead of being sent with each task. The pairs are merged
+	in order afterwards, so count does not depend on processes.
+
+	If prune is True, the diameter is found by boundingDiameter
+	first, and only the vertices whose upper bound on the
+	eccentricity is d are searched, since only they can be the
+	beginning of a universe. The number of searches and of
+	vertices which were skipped is printed.
+
+	'''
+
+	offsets, indices, nodes = graphUtil.csrAdjacency( G )
+
+	N = len(offsets) - 1
+
+	# The eccentricity and the end of each vertex,
+	# E[u] == -1 if it is unknown (and not needed).
+	E = np.full( N, -1, dtype = np.int32 )
+
+	Omega = np.full( N, -1, dtype = np.int64 )
+
+	if prune:
+
+		d, lower, upper, searches = boundingDiameter( offsets, indices )
+
+		for v in searches:
+
+			E[v], Omega[v] = searches[v]
+
+		alphas = np.flatnonzero( ( upper >= d ) & ( E == -1 ) )
+
+		print '\t%d searches for the diameter, %d searches for universes' % \
+				( len(searches), len(alphas) )
+
+		print '\t%d of %d vertices pruned (%.1f%%)' % \
+				( N - len(searches) - len(alphas), N,
+				100. * ( N - len(searches) - len(alphas) ) / N )
+
+	else:
+
+		alphas = np.arange( N )
+
+
+	tasks = [ alphas[ a : a + chunk ].tolist()
+				for a in range( 0, len(alphas), chunk ) ]
+
+
+	if processes == 1 or len(tasks) == 0:
+
+		results = [ eccentricities( task, ( offsets, indices ) )
+					for task in tasks ]
+
+	else:
+
+		dtype = np.dtype( np.int64 )
+
+		sharedOffsets = multiprocessing.RawArray( 'b', len(offsets) * dtype.itemsize )
+		sharedIndices = multiprocessing.RawArray( 'b', len(indices) * dtype.itemsize )
+
+		np.frombuffer( sharedOffsets, dtype = dtype )[:] = offsets
+		np.frombuffer( sharedIndices, dtype = dtype )[:] = indices
+
+		pool = multiprocessing.Pool( processes, shareAdjacency,
+									( sharedOffsets, sharedIndices, dtype ) )
+
+		try:
+
+			results = pool.map( eccentricities, tasks )
+
+		finally:
+
+			pool.close()
+
+			pool.join()
+
+
+	for task, ( taskE, taskOmega ) in zip( tasks, results ):
+
+		E[task] = taskE
+
+		Omega[task] = taskOmega
+
+	if not prune:
+
+		d = int( E.max() )
+
+
+	# Merge the pairs in order, skipping each end
+	# which has been found before.
+	count = 0
+
+	isEnd = np.zeros( N, dtype = bool )
+
+	for u in np.flatnonzero( ( E == d ) & ( Omega >= 0 ) ).tolist():
+
+		if not isEnd[u]:
+
+			count += 1
+
+			isEnd[ Omega[u] ] = True
+
+
+	return count, d
+
+
+
+
+def main():
+	'''
+
+	main()
+
+	Out: A random quadrangulation has been made and the number
+		of alpha-omega pairs in it has been printed.
+
+	'''
+
+	# Oddatala
+	n = 101
+
+	w = [1,0,1]
+
+	xi = 1. * np.array(w) / sum(w) 
+
+	mob_lab = 1
+
+	# ---------------------------------------------
+	# ---------------------------------------------
+
+	#print 'Make tree...'
+	T = makeTree.generateTree(xi,n)
+
+	#print 'Map to mobile...'
+	M = treeToMobile.treeToMobile( T, mob_lab )
+
+	#print 'Map to planar...'
+	G = bdg.mobileToGraph( M, graphUtil.coin(), arrays = True )
+
+
+	# ---------------------------------------------
+	# ---------------------------------------------
+
+
+	#graphUtil.saveGraph( G, 'maxim', draw = True, write = False, prog = 'fdp' )
+
+
+	# Skodum alla hnuta i G og vitum hvort their myndi upphof.
+	# Ef G er u-v alheimur, tha thurfum vid ekki ad skoda v.
+	count, d = universeCount( G )
+
+
+	print 'Fjoldi para: %d' % count
 
-	v = isUniverse(G,u,d)
-	
-	if not u == v:
-		# Ef u og v eru olik, tha er G u-v alheimur
-		# og vid thurfum ekki ad skoda v.
-	
-		count += 1
-		Nodes.remove(v)
 
 
 
-print 'Fjoldi para: %d' % count
+if __name__ == '__main__':
+	main()
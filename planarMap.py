@@ -0,0 +1,343 @@
+
+
+# Python 2.7.6
+#
+#	python planarMap.py
+#
+#	TG
+#
+# Packages:
+# numpy:		For computation.
+# networkx:		Graphs (only imported by to_networkx).
+# struct:		File header.
+# gzip:			Compressed files.
+# scipy.sparse:	Sparse adjacency matrix (only imported by toScipy).
+
+import copy
+import gzip
+import struct
+import numpy as np
+
+
+# The header of a file written by writeHeader.
+fileMagic = 'PLANRMAP'
+
+fileHeader = struct.Struct( '<8s7q' )
+
+
+
+class PlanarMap( object ):
+	'''
+
+	G = PlanarMap( source, target, vertex, awayFrom )
+
+	In: source and target are integer vectors of length m,
+		the endpoints of the edges of a planar map on the
+		vertices 0, 1, ..., n, where n == len(vertex) is
+		the marked vertex rho. Edge number 0 is the root edge.
+		vertex is a vector of length n, vertex[v] is the name
+		of v (e.g. the vertex in the mobile it comes from).
+		awayFrom is source[0] or target[0], the endpoint
+		of the root edge it points away from.
+
+	Out: G is the planar map stored as numpy arrays, a few bytes
+		per edge (see bdg.mobileToGraph). G.source and G.target
+		are int32 vectors (int64 if there are 2**31 vertices or more),
+		G.rho == n, G.rootEdge == 0 and G.awayFrom is as above.
+
+		G.csr() is the adjacency of G in compressed sparse row
+		layout, computed the first time it is used.
+
+		G.graph is a dictionary of data on the map (such as style
+		rules, see graphUtil.addStyle) like networkx.Graph.graph,
+		referring to the vertices of G.to_networkx().
+
+	'''
+
+	def __init__( self, source, target, vertex, awayFrom ):
+
+		n = len(vertex)
+
+		dtype = edgeType( n + 1 )
+
+		self.source = np.asarray( source, dtype = dtype )
+		self.target = np.asarray( target, dtype = dtype )
+
+		if len( self.source ) != len( self.target ):
+
+			raise ValueError('source and target must have the same length.')
+
+		self.vertex = np.asarray( vertex )
+
+		self.rho = n
+
+		self.rootEdge = 0
+
+		self.awayFrom = int( awayFrom )
+
+		self.graph = {}
+
+		self._csr = None
+
+
+
+	def __len__( self ):
+
+		return self.rho + 1
+
+
+
+	def number_of_edges( self ):
+
+		return len( self.source )
+
+
+
+	def csr( self ):
+		'''
+
+		offsets, indices = G.csr()
+
+		Out: The neighbours of v (with repetition for multiple
+			edges) are indices[ offsets[v] : offsets[v+1] ].
+			Both arrays are computed once and kept by G.
+
+		'''
+
+		if self._csr is None:
+
+			n = len(self)
+
+			# Each edge is listed from both of its endpoints.
+			ends = np.concatenate([ self.source, self.target ])
+
+			other = np.concatenate([ self.target, self.source ])
+
+			order = np.argsort( ends, kind = 'mergesort' )
+
+			offsets = np.zeros( n + 1, dtype = self.source.dtype )
+
+			np.cumsum( np.bincount( ends, minlength = n ), out = offsets[1:] )
+
+			self._csr = ( offsets, other[order] )
+
+		return self._csr
+
+
+
+	@property
+	def degrees( self ):
+		'''
+
+		d = G.degrees
+
+		Out: d[v] is the degree of v.
+
+		'''
+
+		return np.diff( self.csr()[0] )
+
+
+
+	def toScipy( self ):
+		'''
+
+		A = G.toScipy()
+
+		Out: A is the adjacency matrix of G as a scipy.sparse.csr_matrix
+			(A[u,v] is the number of edges between u and v). A uses
+			the arrays from G.csr() without copying them.
+
+		'''
+
+		import scipy.sparse
+
+		offsets, indices = self.csr()
+
+		n = len(self)
+
+		data = np.ones( len(indices), dtype = np.int8 )
+
+		return scipy.sparse.csr_matrix( ( data, indices, offsets ),
+										shape = ( n, n ), copy = False )
+
+
+
+	def name( self, v ):
+		'''
+
+		name = G.name( v )
+
+		Out: name is the name of v in G.to_networkx(),
+			vertex[v] as a Python object or 'rho' if v == rho.
+
+		'''
+
+		if v == self.rho:
+
+			return 'rho'
+
+		return self.vertex[v].item()
+
+
+
+	def names( self ):
+		'''
+
+		names = G.names()
+
+		Out: names[v] is the name of v in G.to_networkx(),
+			vertex[v] as a Python object, and names[rho] == 'rho'.
+
+		'''
+
+		return self.vertex.tolist() + [ 'rho' ]
+
+
+
+	def to_networkx( self ):
+		'''
+
+		G = M.to_networkx()
+
+		Out: G is the same map as a networkx.MultiGraph, whose
+			vertices are the names of the vertices of M, with the
+			attribute 'awayFrom' on the root edge. G.graph is
+			a copy of M.graph.
+			G is built when this is called and is not kept by M.
+
+		'''
+
+		import networkx as nx
+
+		names = self.names()
+
+		G = nx.MultiGraph()
+
+		G.add_nodes_from( names )
+
+		G.add_edges_from( zip( [ names[u] for u in self.source.tolist() ],
+								[ names[v] for v in self.target.tolist() ] ) )
+
+		u = self.name( self.source[0] )
+		v = self.name( self.target[0] )
+
+		G[u][v][0]['awayFrom'] = self.name( self.awayFrom )
+
+		for key in self.graph:
+
+			G.graph[key] = copy.copy( self.graph[key] )
+
+		return G
+
+
+
+
+def edgeType( n ):
+	'''
+
+	dtype = edgeType( n )
+
+	Out: dtype is the integer type of the edge vectors
+		of a map with n vertices, numpy.int32 if n < 2**31.
+
+	'''
+
+	if n < 2**31:
+
+		return np.int32
+
+	return np.int64
+
+
+
+
+def openMap( filename, mode = 'rb' ):
+	'''
+
+	f = openMap( filename, mode )
+
+	Out: f is the file filename opened in mode, with gzip
+		compression if filename ends with '.gz'.
+
+	'''
+
+	if filename.endswith( '.gz' ):
+
+		return gzip.open( filename, mode )
+
+	return open( filename, mode )
+
+
+
+
+def writeHeader( f, rho, m, source, target, awayFrom, dtype ):
+	'''
+
+	writeHeader( f, rho, m, source, target, awayFrom, dtype )
+
+	In: f is a file opened for writing in binary mode.
+		The map has the vertices 0, 1, ..., rho (rho is the marked
+		vertex), m edges and the root edge is (source, target),
+		pointing away from awayFrom. dtype is the integer type
+		of the edges (see edgeType).
+
+	Out: The header has been written to f. A map file is the header
+		followed by the m edges as pairs (source, target) of
+		little endian integers of type dtype. The header is
+
+			'PLANRMAP', n = rho + 1, m, rho, source, target,
+			awayFrom, the number of bytes of dtype
+
+		where all the numbers are little endian 64 bit integers.
+
+	'''
+
+	header = [ rho + 1, m, rho, source, target, awayFrom,
+				np.dtype( dtype ).itemsize ]
+
+	f.write( fileHeader.pack( fileMagic, *map( int, header ) ) )
+
+
+
+
+def readMap( filename, mmap = True ):
+	'''
+
+	G = readMap( filename, mmap )
+
+	In: filename is a map file (see writeHeader), such as
+		the output of bdg.writeMap.
+		mmap is a boolean (default True).
+
+	Out: G is the map as a PlanarMap, whose vertices are named by
+		their numbers (G.vertex[v] == v). If mmap is True and the
+		file is not compressed, G.source and G.target are views of
+		the file mapped into memory, so the edges are only read
+		from the disk when they are used.
+
+	'''
+
+	with openMap( filename, 'rb' ) as f:
+
+		magic, n, m, rho, source, target, awayFrom, itemsize = \
+			fileHeader.unpack( f.read( fileHeader.size ) )
+
+		if magic != fileMagic:
+
+			raise ValueError('%s is not a planar map file.' % filename)
+
+		dtype = np.dtype( '<i%d' % itemsize )
+
+		if mmap and not filename.endswith( '.gz' ):
+
+			edges = np.memmap( filename, dtype = dtype, mode = 'r',
+								offset = fileHeader.size, shape = ( m, 2 ) )
+
+		else:
+
+			edges = np.frombuffer( f.read( m * 2 * itemsize ),
+									dtype = dtype ).reshape( m, 2 )
+
+
+	return PlanarMap( edges[:,0], edges[:,1], np.arange( rho ), awayFrom )
@@ -0,0 +1,325 @@
+
+
+# Python 2.7.6
+#
+#	python planeTree.py
+#
+#	TG
+#
+# Packages:
+# numpy:		For computation.
+# networkx:		Graphs (only imported by to_networkx).
+
+import copy
+import numpy as np
+
+
+
+class PlaneTree( object ):
+	'''
+
+	T = PlaneTree( Xi )
+
+	In: Xi is a list (list, numpy.ndarray,...) of n integers,
+		the offspring numbers of a tree in breadth first order
+		(for example the output of makeTree.createXi).
+
+	Out: T is a plane tree with vertices 0, 1, ..., n-1 stored in
+		numpy arrays, such that vertex number j has Xi[j] children
+		(0 is the root). The vertices are numbered in breadth first
+		order and the children of each vertex are in ascending order
+		from left to right, so the children of v are
+
+			T.offsets[v], T.offsets[v] + 1, ..., T.offsets[v+1] - 1.
+
+		This is the compressed sparse row (CSR) layout of the tree
+		with the trivial index array 1, 2, ..., n-1, so only the
+		offsets are stored.
+
+		T.parent, T.depth, T.size (parent, generation and number of
+		descendants, including the vertex itself, of each vertex;
+		T.parent[0] == -1) and T.preorder are computed the first
+		time they are used.
+
+		T.data is a dictionary of vectors of length n with data
+		on the vertices (such as 'label') and T.graph is a dictionary
+		of data on the tree (such as style rules, see
+		graphUtil.addStyle), like networkx.Graph.graph.
+
+	'''
+
+	def __init__( self, Xi ):
+
+		n = len(Xi)
+
+		if n < 2**31:
+			dtype = np.int32
+		else:
+			dtype = np.int64
+
+		# offsets[v] = 1 + Xi[0] + ... + Xi[v-1]
+		self.offsets = np.empty( n + 1, dtype = dtype )
+
+		self.offsets[0] = 1
+
+		np.cumsum( Xi, out = self.offsets[1:] )
+
+		self.offsets[1:] += 1
+
+		# Each vertex v > 0 must be the child of a vertex before it
+		# (e.g. Xi = [0, 1] is not a tree, even though sum(Xi) == n-1).
+		if self.offsets[-1] != n or \
+				not np.all( self.offsets[1:n] > np.arange( 1, n ) ):
+
+			raise ValueError('Xi is not the offspring sequence of a tree' +\
+								' with %d vertices.' % n)
+
+		self.data = {}
+		self.graph = {}
+
+		self._parent = None
+		self._generations = None
+		self._depth = None
+		self._size = None
+		self._preorder = None
+
+
+
+	def __len__( self ):
+
+		return len( self.offsets ) - 1
+
+
+
+	def children( self, v ):
+		'''
+
+		children = T.children( v )
+
+		Out: children is the range of the children of v,
+			from left to right.
+
+		'''
+
+		return range( self.offsets[v], self.offsets[v+1] )
+
+
+
+	@property
+	def degrees( self ):
+		'''
+
+		Xi = T.degrees
+
+		Out: Xi[v] is the number of children of v.
+
+		'''
+
+		return np.diff( self.offsets )
+
+
+
+	@property
+	def parent( self ):
+
+		if self._parent is None:
+
+			n = len(self)
+
+			self._parent = np.empty( n, dtype = self.offsets.dtype )
+
+			self._parent[0] = -1
+
+			self._parent[1:] = np.repeat(
+								np.arange( n, dtype = self.offsets.dtype ),
+								self.degrees )
+
+		return self._parent
+
+
+
+	@property
+	def generations( self ):
+		'''
+
+		g = T.generations
+
+		Out: g is an increasing vector such that generation k
+			is the vertices g[k], g[k] + 1, ..., g[k+1] - 1.
+
+		'''
+
+		if self._generations is None:
+
+			g = [ 0, 1 ]
+
+			# The children of generation k are generation k+1.
+			while g[-1] < len(self):
+
+				g.append( self.offsets[ g[-1] ] )
+
+			self._generations = np.array( g, dtype = self.offsets.dtype )
+
+		return self._generations
+
+
+
+	@property
+	def depth( self ):
+
+		if self._depth is None:
+
+			g = self.generations
+
+			self._depth = np.repeat(
+							np.arange( len(g) - 1, dtype = self.offsets.dtype ),
+							np.diff( g ) )
+
+		return self._depth
+
+
+
+	@property
+	def size( self ):
+
+		if self._size is None:
+
+			g = self.generations
+
+			size = np.ones( len(self), dtype = self.offsets.dtype )
+
+			# From the bottom generation up, each vertex gets the sum of
+			# the sizes of its children (which are consecutive).
+			for k in range( len(g) - 3, -1, -1 ):
+
+				first = self.offsets[ g[k] : g[k+1] + 1 ]
+
+				S = np.concatenate([ [0], np.cumsum( size[ g[k+1] : g[k+2] ] ) ])
+
+				size[ g[k] : g[k+1] ] += np.diff( S[ first - g[k+1] ] )
+
+			self._size = size
+
+		return self._size
+
+
+
+	@property
+	def preorder( self ):
+		'''
+
+		pre = T.preorder
+
+		Out: pre[v] is the index of v in depth first order
+			(with the children from left to right).
+
+		'''
+
+		if self._preorder is None:
+
+			g = self.generations
+
+			size = self.size
+
+			parent = self.parent
+
+			pre = np.zeros( len(self), dtype = self.offsets.dtype )
+
+			# The vertices before a child are its parent, the vertices
+			# before the parent and the subtrees of its older siblings.
+			for k in range( 1, len(g) - 1 ):
+
+				s = size[ g[k] : g[k+1] ]
+
+				# S[i] is the total size of the vertices before g[k] + i
+				# in generation k.
+				S = np.cumsum( s ) - s
+
+				p = parent[ g[k] : g[k+1] ]
+
+				pre[ g[k] : g[k+1] ] = pre[p] + 1 + S - S[ self.offsets[p] - g[k] ]
+
+			self._preorder = pre
+
+		return self._preorder
+
+
+
+	def to_networkx( self ):
+		'''
+
+		G = T.to_networkx()
+
+		Out: G is the same tree as a networkx.Graph, for drawing
+			and for code that works with networkx graphs.
+			The vectors in T.data become node attributes and
+			G.graph is a copy of T.graph.
+			G is built when this is called and is not kept by T.
+
+		'''
+
+		import networkx as nx
+
+		n = len(self)
+
+		G = nx.Graph()
+
+		G.add_nodes_from( range(n) )
+
+		G.add_edges_from( zip( self.parent[1:].tolist(), range( 1, n ) ) )
+
+		for name in self.data:
+
+			nx.set_node_attributes( G, dict(enumerate( self.data[name].tolist() )),
+									name )
+
+		for key in self.graph:
+
+			G.graph[key] = copy.copy( self.graph[key] )
+
+		return G
+
+
+
+
+def fromNetworkx( G, root = 0 ):
+	'''
+
+	T = fromNetworkx( G, root )
+
+	In: G is a tree (networkx.Graph) with integer vertices
+		and root is a vertex in G (default 0).
+		We take the children of each vertex to be drawn in
+		ascending order from left to right in the plane.
+
+	Out: T is the same plane tree as a PlaneTree, i.e. with the
+		vertices renumbered in breadth first order.
+		T.data['vertex'][v] is the vertex in G numbered v in T.
+
+	'''
+
+	Xi = []
+
+	order = [ root ]
+
+	parent = { root: None }
+
+	# Breadth first search; order grows while it is traversed.
+	for v in order:
+
+		children = sorted( u for u in G[v] if u != parent[v] )
+
+		for u in children:
+
+			parent[u] = v
+
+		order.extend( children )
+
+		Xi.append( len(children) )
+
+
+	T = PlaneTree( Xi )
+
+	T.data['vertex'] = np.array( order )
+
+	return T
@@ -3,107 +3,162 @@
 # Python 2.7.6
 # dot - graphviz version 2.36.0 (20140111.2315)
 #
-#	python randomGraph.py n
+#	python randomGraph.py [n] [options]
 #
 #	n is the number of vertices in a random tree, default: 100.
+#	See python randomGraph.py --help for the options.
 #
 #	TG
 #	13/08/2015
 #
+# Packages:
+# numpy:		For computation.
+# argparse:		Command line.
+#
+# Nothing is done when randomGraph is imported, the pipeline is
+# the function randomGraph and the command line is main.
 
-import sys
+import argparse
 import numpy as np
-import scipy.stats as scistats
-import networkx as nx
 import graphUtil, makeTree, treeToMobile, bdg
 
 
-# ---------------------------------------------
-# ---------------------------------------------
+
+def randomGraph( xi, n, labels = 2, arrays = False ):
+	'''
+
+	M, G = randomGraph( xi, n, labels, arrays )
+
+	In: xi is a probability distribution, should have expected
+		value approximately 1 (see makeTree.generateTree).
+		Note that if xi(1) == 0, then it is not necessarily possible
+		to create a tree with n vertices with the offspring
+		distribution xi.
+		labels is 0, 1 or 2 (default 2), the labels on the mobile are
+			0 for zeroes
+			1 for deterministic labels
+			2 for random labels.
+		arrays is a boolean (default False).
+
+	Out: M is a random labeled mobile (planeTree.PlaneTree) made from
+		a random tree with n vertices and offspring distribution xi,
+		and G is the planar map which corresponds to M (see
+		bdg.mobileToGraph, G is a planarMap.PlanarMap if arrays
+		is True). The appearance of both has been recorded with
+		style rules (see graphUtil.addStyle).
+
+	'''
+
+	print 'Make tree...'
+	T = makeTree.generateTree( xi, n )
+
+
+	print 'Map to mobile...'
+	M = treeToMobile.treeToMobile( T, labels = labels )
+
+
+	print 'Map to planar...'
+	G = bdg.mobileToGraph( M, graphUtil.coin(), arrays = arrays )
 
 
-# SETTINGS
+	# Appearance, before the rules of mobileToGraph (rho in green and
+	# the root edge in blue), so that those are applied last.
+	rules = G.graph.pop( 'styleRules', [] )
 
+	graphUtil.addStyle( G, 'shape', 'point' )
+	graphUtil.addStyle( G, 'color', 'red' )
 
+	G.graph[ 'styleRules' ].extend( rules )
 
-# If no argument is given on command line:
-n = 100
 
+	return M, G
 
 
-# If number of vertices was given on command line:
-if len( sys.argv ) > 1:
 
-	n = int( sys.argv[1] )
 
+def main( argv = None ):
+	'''
 
-file_name = 'Graph_%d' % n
+	main( argv )
 
+	In: argv is None (default, for sys.argv[1:]) or a list of
+		command line arguments.
 
+	Out: A random mobile and planar map have been made by randomGraph
+		and saved (by default in Graph_nmobile.png and Graph_n.png).
 
-# Probability distribution xi, should have expected
-# value approximately 1.
-# Note that if xi(1) == 0, then it is not necessarily possible to
-# create a tree with n vertices with the offspring distribution xi.
+	'''
 
-# xi can be defined as a function...
+	parser = argparse.ArgumentParser( description =
+				'Make a random planar map from a random tree.' )
 
-beta = 2.4788
+	parser.add_argument( 'n', nargs = '?', type = int, default = 100,
+				help = 'the number of vertices in the tree (default 100)' )
 
-xi = graphUtil.fatTail( beta )
+	parser.add_argument( '--beta', type = float, default = 2.4788,
+				help = 'xi is graphUtil.fatTail( beta ) (default 2.4788)' )
 
+	parser.add_argument( '--weights', type = float, nargs = '+',
+				help = 'xi is graphUtil.equivalentWeights( weights ) ' +
+						'instead of a fat tail, e.g. --weights 1 0 1' )
 
-# ...or as a vector.
+	parser.add_argument( '--labels', type = int, default = 2,
+				choices = [ 0, 1, 2 ],
+				help = 'the labels on the mobile, 0 for zeroes, ' +
+						'1 deterministic, 2 random (default 2)' )
 
-#w = [1,0,1]
+	parser.add_argument( '--seed', type = int,
+				help = 'seed for numpy.random' )
 
-#xi = graphUtil.equivalentWeights( w )
+	parser.add_argument( '--format', default = 'graphviz',
+				choices = [ 'graphviz', 'npz', 'edges', 'dot', 'png' ],
+				help = 'how the map is saved, see graphUtil.saveGraph ' +
+						'(default graphviz)' )
 
+	parser.add_argument( '--prog', default = 'fdp',
+				help = 'the graphviz layout of the map (default fdp)' )
 
-# The labels on the mobile are determined by mob_lab = 0, 1, 2
-# 0 for zeroes
-# 1 for deterministic labels
-# 2 for random labels
-mob_lab = 2
+	parser.add_argument( '--name',
+				help = 'the file name (default Graph_n)' )
 
+	args = parser.parse_args( argv )
 
 
-# ---------------------------------------------
-# ---------------------------------------------
+	if args.seed is not None:
 
+		np.random.seed( args.seed )
 
-print 'Make tree...'
-T = makeTree.generateTree( xi, n )
+	if args.weights is None:
 
+		xi = graphUtil.fatTail( args.beta )
 
-print 'Map to mobile...'
-M = treeToMobile.treeToMobile( T, labels = mob_lab )
+	else:
 
+		xi = graphUtil.equivalentWeights( args.weights )
 
-print 'Save mobile...'
-graphUtil.saveGraph( M, file_name + 'mobile' )
+	file_name = args.name or 'Graph_%d' % args.n
 
+	graphviz = args.format == 'graphviz'
 
-print 'Map to planar...'
-G = bdg.mobileToGraph( M, graphUtil.coin() )
 
+	M, G = randomGraph( xi, args.n, args.labels, arrays = not graphviz )
 
 
+	if graphviz:
 
-# Appearance
-Point = dict(zip( G.nodes(), [ 'point' ] * len(T) ))
-Red   = dict(zip( G.nodes(), [ 'red' ] * len(T) ))
+		print 'Save mobile...'
+		graphUtil.saveGraph( M, file_name + 'mobile' )
 
-nx.set_node_attributes( G, Point, 'shape' )
-nx.set_node_attributes( G, Red, 'color' )
 
-G.node[ 'rho' ][ 'color' ] = 'green'
+	print 'Save planar...'
+	graphUtil.saveGraph( G, file_name, draw = True, write = False,
+						prog = args.prog, format = args.format )
 
 
+	print 'Ok.'
 
 
-print 'Save planar...'
-graphUtil.saveGraph( G, file_name, draw = True, write = False, prog = 'fdp' )
 
 
-print 'Ok.'
+if __name__ == '__main__':
+	main()
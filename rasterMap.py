@@ -0,0 +1,378 @@
+
+
+# Python 2.7.6
+#
+#	python rasterMap.py [n]
+#
+#	TG
+#
+# Packages:
+# numpy:		For computation.
+# zlib, struct:	Writing PNG images.
+# time:			Timing the stages of drawMap.
+
+import sys
+import time
+import struct
+import zlib
+import numpy as np
+
+import graphUtil
+import planeTree
+import makeTree
+import treeToMobile
+import bdg
+
+
+
+def radialLayout( offsets, indices, center ):
+	'''
+
+	x, y = radialLayout( offsets, indices, center )
+
+	In: offsets, indices is the adjacency of a connected graph G
+		(see graphUtil.csrAdjacency) and center is a vertex in G.
+
+	Out: x, y are the coordinates of the vertices of G in a layout
+		where the distance of v from the origin is the graph distance
+		from center to v (for a map from a mobile, where center is rho,
+		this is the label of v up to a constant).
+
+	A breadth first search tree from center is drawn as a radial
+	tree: each subtree gets a wedge of angle proportional to its
+	number of vertices, and each vertex is in the middle of its wedge.
+	The tree is built as a planeTree.PlaneTree, so the wedges come
+	from its depth first order and subtree sizes.
+
+	'''
+
+	N = len(offsets) - 1
+
+	dist = graphUtil.bfsDistances( offsets, indices, center )
+
+
+	# The parent of v in the tree is its first neighbour
+	# closer to center.
+	row = np.repeat( np.arange( N ), np.diff( offsets ) )
+
+	closer = np.flatnonzero( dist[indices] == dist[row] - 1 )
+
+	children, first = np.unique( row[closer], return_index = True )
+
+	parent = np.full( N, -1, dtype = np.int64 )
+
+	parent[children] = indices[ closer[first] ]
+
+
+	# Number the vertices in breadth first order, generation by
+	# generation, such that the children of each vertex are
+	# consecutive (sorted by the number of the parent).
+	rank = np.zeros( N, dtype = np.int64 )
+
+	byDistance = np.argsort( dist, kind = 'mergesort' )
+
+	g = np.concatenate([ [0], np.cumsum( np.bincount( dist ) ) ])
+
+	for k in range( 1, len(g) - 1 ):
+
+		generation = byDistance[ g[k] : g[k+1] ]
+
+		generation = generation[ np.argsort( rank[ parent[generation] ],
+												kind = 'mergesort' ) ]
+
+		rank[generation] = np.arange( g[k], g[k+1] )
+
+
+	Xi = np.bincount( rank[ parent[ parent >= 0 ] ], minlength = N )
+
+	T = planeTree.PlaneTree( Xi )
+
+	angle = 2 * np.pi * ( T.preorder + T.size / 2. ) / N
+
+	theta = angle[rank]
+
+	return dist * np.cos( theta ), dist * np.sin( theta )
+
+
+
+
+def smoothLayout( x, y, offsets, indices, fixed = None, iterations = 5,
+					weight = 0.5 ):
+	'''
+
+	x, y = smoothLayout( x, y, offsets, indices, fixed, iterations, weight )
+
+	In: x, y are the coordinates of the vertices of a graph G
+		with the adjacency offsets, indices (see graphUtil.csrAdjacency).
+		fixed is None or a list of vertices which are not moved.
+		iterations is a non-negative integer (default 5) and
+		weight is a number between 0 and 1 (default 0.5).
+
+	Out: x, y have been moved iterations times towards the
+		average position of their neighbours,
+
+			x[v] = ( 1 - weight ) x[v] + weight mean( x[u] ),
+
+		which makes a layout less jagged (a few steps of Tutte's
+		barycentric method). Each step is two sums over the
+		edges with numpy.add.reduceat.
+
+	'''
+
+	x = np.array( x, dtype = float )
+	y = np.array( y, dtype = float )
+
+	degree = np.diff( offsets )
+
+	# Vertices without neighbours stay where they are.
+	moving = degree > 0
+
+	if fixed is not None:
+
+		moving[fixed] = False
+
+	# A zero is added after the neighbours of the last vertex
+	# so that offsets[:-1] are valid indices.
+	values = np.zeros( len(indices) + 1 )
+
+	for k in range( iterations ):
+
+		for z in ( x, y ):
+
+			np.take( z, indices, out = values[:-1] )
+
+			mean = np.add.reduceat( values, offsets[:-1] ) / np.maximum( degree, 1 )
+
+			z[moving] = ( 1 - weight ) * z[moving] + weight * mean[moving]
+
+	return x, y
+
+
+
+
+def rasterize( x, y, source, target, size = 2048, margin = 16, chunk = 2**16 ):
+	'''
+
+	count, px, py = rasterize( x, y, source, target, size, margin, chunk )
+
+	In: x, y are the coordinates of the vertices of a graph and
+		source, target are the endpoints of its edges (see
+		graphUtil.edgeArrays).
+		size, margin are positive integers (default 2048, 16).
+		chunk is a positive integer (default 2**16).
+
+	Out: The layout has been scaled to a size x size image with the
+		given margin, px, py are the pixels of the vertices and
+		count[i,j] is the number of edges through pixel (i,j).
+
+	All the edges are drawn together: each edge is sampled at one
+	point per pixel of its length and the points are counted with
+	numpy.bincount, chunk edges at a time.
+
+	'''
+
+	x = np.asarray( x, dtype = float )
+	y = np.asarray( y, dtype = float )
+
+	# Scale the layout, keeping the aspect ratio.
+	width = max( x.max() - x.min(), y.max() - y.min() )
+
+	scale = ( size - 2 * margin - 1 ) / max( width, 1e-12 )
+
+	px = margin + ( x - x.min() ) * scale
+	py = margin + ( y.max() - y ) * scale
+
+	count = np.zeros( size * size, dtype = np.int64 )
+
+	for a in range( 0, len(source), chunk ):
+
+		u = source[ a : a + chunk ]
+		v = target[ a : a + chunk ]
+
+		dx = px[v] - px[u]
+		dy = py[v] - py[u]
+
+		# The number of points on each edge.
+		length = np.maximum( np.abs(dx), np.abs(dy) ).astype( np.int64 ) + 1
+
+		edge = np.repeat( np.arange( len(u) ), length )
+
+		t = ( np.arange( len(edge) ) - np.repeat( np.cumsum( length ) - length,
+												length ) ) / \
+			np.maximum( length - 1., 1. )[edge]
+
+		i = np.round( py[ u[edge] ] + t * dy[edge] ).astype( np.int64 )
+		j = np.round( px[ u[edge] ] + t * dx[edge] ).astype( np.int64 )
+
+		count += np.bincount( i * size + j, minlength = size * size )
+
+	return count.reshape( size, size ), px, py
+
+
+
+
+def writePng( filename, image ):
+	'''
+
+	writePng( filename, image )
+
+	In: filename is a string and image is a height x width x 3
+		array of integers between 0 and 255 (RGB colors).
+
+	Out: image has been saved in filename as a PNG image
+		(only zlib is needed, no image library).
+
+	'''
+
+	image = np.ascontiguousarray( image, dtype = np.uint8 )
+
+	height, width = image.shape[:2]
+
+	# Each row starts with the filter type 0 (none).
+	rows = np.zeros( ( height, 3 * width + 1 ), dtype = np.uint8 )
+
+	rows[:,1:] = image.reshape( height, 3 * width )
+
+
+	def pngChunk( kind, data ):
+
+		return struct.pack( '>I', len(data) ) + kind + data + \
+				struct.pack( '>I', zlib.crc32( kind + data ) & 0xffffffff )
+
+
+	with open( filename, 'wb' ) as f:
+
+		f.write( '\x89PNG\r\n\x1a\n' )
+
+		f.write( pngChunk( 'IHDR', struct.pack( '>IIBBBBB', width, height,
+													8, 2, 0, 0, 0 ) ) )
+
+		f.write( pngChunk( 'IDAT', zlib.compress( rows.tobytes(), 6 ) ) )
+
+		f.write( pngChunk( 'IEND', '' ) )
+
+
+
+
+def drawMap( G, filename, size = 2048, iterations = 5 ):
+	'''
+
+	seconds = drawMap( G, filename, size, iterations )
+
+	In: G is a connected graph (networkx.Graph, planeTree.PlaneTree
+		or planarMap.PlanarMap) and filename is a string.
+		size is a positive integer (default 2048) and iterations
+		is a non-negative integer (default 5).
+
+	Out: A size x size picture of G has been saved in filename.png,
+		without pygraphviz, so it works for graphs with 10^5 - 10^6
+		vertices. The layout is radialLayout around 'rho' (or
+		vertex 0 if G has no 'rho'), smoothed with smoothLayout.
+		The darkness of a pixel grows with the logarithm of the
+		number of edges through it and rho is drawn in green.
+
+		The time of each stage has been printed and
+		seconds[stage] is the time in seconds.
+
+	'''
+
+	seconds = {}
+
+	start = time.time()
+
+
+	def stage( name ):
+
+		seconds[name] = time.time() - start - sum( seconds.values() )
+
+		print '\t%s: %.2f s' % ( name, seconds[name] )
+
+
+	offsets, indices, nodes = graphUtil.csrAdjacency( G )
+
+	source, target = graphUtil.edgeArrays( G )[:2]
+
+	if hasattr( G, 'rho' ):
+
+		center = G.rho
+
+	elif 'rho' in nodes:
+
+		center = nodes.index( 'rho' )
+
+	else:
+
+		center = 0
+
+	stage( 'Adjacency' )
+
+
+	x, y = radialLayout( offsets, indices, center )
+
+	stage( 'Layout' )
+
+
+	x, y = smoothLayout( x, y, offsets, indices, [ center ], iterations )
+
+	stage( 'Smoothing' )
+
+
+	count, px, py = rasterize( x, y, source, target, size )
+
+	stage( 'Rasterize' )
+
+
+	# Gray levels on a logarithmic scale, white background.
+	darkness = np.log1p( count ) / max( np.log1p( count.max() ), 1e-12 )
+
+	gray = ( 255 * ( 1 - darkness ) ).astype( np.uint8 )
+
+	image = np.dstack([ gray, gray, gray ])
+
+	i = int( round( py[center] ) )
+	j = int( round( px[center] ) )
+
+	image[ max( i - 3, 0 ) : i + 4, max( j - 3, 0 ) : j + 4 ] = ( 0, 160, 0 )
+
+	print '\tDraw %s.png...' % filename
+
+	writePng( filename + '.png', image )
+
+	stage( 'Write' )
+
+
+	return seconds
+
+
+
+
+def main():
+	'''
+
+	main()
+
+	Out: A random quadrangulation with n vertices (n is the
+		first argument, default 10^5) has been drawn in
+		rasterMap.png.
+
+	'''
+
+	n = 10**5
+
+	if len( sys.argv ) > 1:
+
+		n = int( sys.argv[1] )
+
+	T = makeTree.generateTree( [ 0.5, 0, 0.5 ], 2 * ( n // 2 ) + 1 )
+
+	M = treeToMobile.treeToMobile( T, labels = 2 )
+
+	G = bdg.mobileToGraph( M, graphUtil.coin(), arrays = True )
+
+	drawMap( G, 'rasterMap' )
+
+
+
+
+if __name__ == '__main__':
+	main()
@@ -9,202 +9,252 @@
 #	13/08/2015
 #
 # Packages:
-# Queue:		relabelTree and treeBijection use Queue
-# networkx:		Graphs
+# functools:	Style rules in makeMobile
+# networkx:		Graphs (only imported for networkx.Graph input)
 # numpy:		For computation
 
 
-import Queue
-import networkx as nx
+import functools
 import numpy as np
 
 import graphUtil
+import planeTree
 
 
 
-def relabelTree( T, root ):
+def relabelTree( parent, age, root ):
 	'''
 
-	S = relabelTree( T, root )
+	M = relabelTree( parent, age, root )
 
-	In: T is a tree with vertices 0, 1, ..., n-1 and root is a vertex in T.
-		Each vertex in T has an integer 'age' attribute such that siblings
-		have different ages.
-		We take siblings to be drawn in ascending order by age from left to
-		right in the plane.
+	In: parent and age are integer vectors describing a tree with
+		vertices 0, 1, ..., n-1 and root as root, such that vertex v
+		has parent[v] as its parent (parent[root] == -1).
+		Siblings have different ages and we take siblings to be
+		drawn in ascending order by age from left to right in the plane.
 
-	Out: S is a new tree that is just like T, except the vertices have been
-		relabeled to 0, 1, ..., n-1 such that the root is 0 and for each
-		vertex its children are in ascending order from left to right,
-		all vertices in generation <=k are smaller than all vertices in
-		generation >k (for all k).
+	Out: M is the same plane tree as a planeTree.PlaneTree, i.e. the
+		vertices have been relabeled to 0, 1, ..., n-1 such that the
+		root is 0 and for each vertex its children are in ascending
+		order from left to right, all vertices in generation <=k are
+		smaller than all vertices in generation >k (for all k).
+		M.data[ 'age' ] is age relabeled and M.data[ 'vertex' ][v]
+		is the old label of the vertex that is now v.
+
+	The breadth first order is computed one generation at a time with
+	array operations and the per-vertex vectors are permuted,
+	so the tree is never copied into a graph.
 
 	'''
 
-	n = nx.number_of_nodes( T )
+	n = len( parent )
+
+	# The children of each vertex, sorted by age, are consecutive
+	# in children, starting at first[v] (the root is skipped).
+	children = np.lexsort(( age, parent ))[1:]
+
+	count = np.bincount( parent[children], minlength = n )
+
+	first = np.cumsum( count ) - count
+
 
-	# Dictionary for the new labels.
-	newLabels = dict(zip( range(n), range(n) ))
+	# vertex[k] is the vertex that gets the new label k.
+	vertex = np.empty( n, dtype = parent.dtype )
 
-	nextLabel = 0
+	vertex[0] = root
 
-	Q = Queue.Queue( maxsize = n )
+	done = 1
 
-	Q.put( ( root, None ) )
+	level = vertex[:1]
 
-	while not Q.empty():
-		# We have found labels for all the nextLabel vertices
-		# that are not descendants of the vertices in the queue Q.
+	while done < n:
+		# The next generation is the children of level, in order.
 
-		# The next vertex, node, gets the next number.
-		node, parent = Q.get()
+		c = count[level]
 
-		newLabels[node] = nextLabel
+		total = c.sum()
 
-		nextLabel = nextLabel + 1
+		k = np.arange( total ) + np.repeat( first[level] - ( np.cumsum( c ) - c ), c )
 
-		# Put each child of node on the queue in ascending order by age.
-		children = graphUtil.childrenOf( node, T, parent )
+		vertex[ done : done + total ] = children[k]
 
-		children.sort( key = lambda child: T.node[child][ 'age' ] )
+		level = vertex[ done : done + total ]
 
-		for child in children:
+		done = done + total
 
-			Q.put( ( child, node ) )
 
+	M = planeTree.PlaneTree( count[vertex] )
 
-	# Relabel the vertices according to the dictionary.
-	return nx.relabel_nodes( T, newLabels )
+	M.data[ 'age' ] = age[vertex]
+
+	M.data[ 'vertex' ] = vertex
+
+	return M
 
 
 
 
-def biggestBlueChild( node, T, M ):
+def bijectionArrays( T ):
 	'''
 
 	Used by treeBijection
 
-	blueChild = biggestBlueChild( node, T, M )
+	parent, age, rootM = bijectionArrays( T )
+
+	In: T is a tree (planeTree.PlaneTree) with n >= 2 vertices.
+
+	Out: parent and age are vectors such that the mobile M made by
+		the bijection in 'Recurrence of bipartite planar maps' by
+		S.O.S. and J.E.B. is the tree with root rootM, where vertex v
+		has parent[v] as its parent (parent[rootM] == -1) and the
+		children of each vertex are in ascending order by age from
+		left to right. The vertices are the vertices of T.
 
-	In: T is a tree with integer vertices
-		and M is a forest with the same set of vertices.
-		node is a vertex in T and M.
-		If node has a parent in T, then that parent is red in M.
+	The bijection walks down from a vertex v, first to a child c and
+	then through the last children of c, ..., to a leaf L (the
+	rightmost leaf below c). This is a bloodline and L is connected
+	to v and to every vertex on the way. The bloodlines start at each
+	child c of the root and at each child c of another vertex that is
+	not its last child (the last child continues the bloodline that
+	found v). So with
 
-	Out: blueChild is the largest child of node that has its
-		'color' attribute not set to 'red'
+		top[u] = the first vertex c of the bloodline that contains u,
+		leaf[u] = the rightmost leaf below u,
+
+	the mobile is determined by (with v = T.parent[top[u]]):
+
+		a leaf u has parent v in M and age last[v] - top[u]
+		(the number of bloodlines started at v before it,
+		plus one if v is not the root),
+
+		any other vertex u has parent leaf[u] in M and age equal to
+		its position in the bloodline, 1 + depth[u] - depth[top[u]],
+		plus one if it is on the first bloodline. The root of T has
+		age 1 and its parent is the root of M, which is the leaf
+		of the first bloodline.
+
+	leaf and top are computed one generation at a time, from the
+	bottom up and from the top down, so no vertex is visited by
+	python code and the running time is O(n) even for vertices
+	with many children.
 
 	'''
 
-	# Note that None < x for all numbers x.
-	blueChild = None
+	n = len(T)
 
-	for v in nx.all_neighbors( T, node ):
+	Xi = T.degrees
 
-		if M.node[v][ 'color' ] != 'red' and blueChild < v:
+	g = T.generations
 
-			blueChild = v
+	parentT = T.parent
 
+	depth = T.depth
 
-	return blueChild
+	# last[v] is the last (rightmost) child of v, if any.
+	last = T.offsets[1:] - 1
 
+	isLeaf = Xi == 0
 
+	# The vertices that start a bloodline.
+	isStart = np.ones( n, dtype = bool )
 
+	isStart[ last[ ~isLeaf ] ] = False
 
+	isStart[ last[0] ] = True
 
-def treeBijection( T ):
-	'''
+	isStart[0] = False
 
-	M = treeBijection( T )
 
-	In: T is a tree with vertices 0, 1, ..., n-1 such that
-		the children of each vertex are larger than the vertex itself
-		(and thus the smalles vertex, 0, is the root of T).
+	# leaf[u] = leaf[ last[u] ] for the vertices that are not leaves.
+	leaf = np.arange( n, dtype = T.offsets.dtype )
 
-	Out: M is a tree, with the same set of vertices as T, that is
-		made by the bijection described in 'Recurrence of bipartite
-		planar maps' by S.O.S. and J.E.B.
-		The vertices in M are ordered such that 0 is the root,
-		the children of each vertex are in ascending from left to right,
-		all vertices in generation <=k are smaller than all vertices
-		in generation >k (for all k).
+	for k in range( len(g) - 2, -1, -1 ):
 
-	'''
+		u = np.arange( g[k], g[k+1] )
 
-	# Create a new empty graph with the same set of vertices as T.
-	M = nx.Graph()
+		u = u[ ~isLeaf[u] ]
 
-	M.add_nodes_from( T.nodes(), color = 'blue', age = 0 )
+		leaf[u] = leaf[ last[u] ]
 
 
-	# Connect the nodes in M
-	Q = Queue.Queue( maxsize = len(T) )
+	# top[u] = top[ parent[u] ] if u does not start a bloodline.
+	top = np.arange( n, dtype = T.offsets.dtype )
 
-	Q.put( 0 )
+	for k in range( 1, len(g) - 1 ):
 
-	while not Q.empty():
+		u = np.arange( g[k], g[k+1] )
 
-		node = Q.get()
+		u = u[ ~isStart[u] ]
 
-		# Color node red.
-		M.node[node][ 'color' ] = 'red'
+		top[u] = top[ parentT[u] ]
 
-		# Find the largest child of node in T, that is not red in M.
-		next = biggestBlueChild( node, T, M )
 
-		# If no such child exists, then we are done.
-		if next is None:
-			continue
+	rootM = leaf[ last[0] ]
 
-		# Create a list of blue descendants of node to be colored red.
-		bloodLine = [ node ]
+	isFirst = top == last[0]
 
-		# Add to the list until we find a leaf.
-		while T.degree( next ) > 1:
 
-			# Color the next vertex red.
-			M.node[next][ 'color' ] = 'red'
+	parent = np.empty( n, dtype = T.offsets.dtype )
+	age = np.empty( n, dtype = T.offsets.dtype )
 
-			bloodLine.append(next)
+	parent[ ~isLeaf ] = leaf[ ~isLeaf ]
 
-			# Find the largest child of next in T that is not red in M.
-			next = biggestBlueChild( next, T, M )
+	age[ ~isLeaf ] = 1 + depth[ ~isLeaf ] - depth[ top[ ~isLeaf ] ] \
+						+ isFirst[ ~isLeaf ]
 
+	v = parentT[ top[ isLeaf ] ]
 
+	parent[ isLeaf ] = v
 
-		# We have found a leaf.
-		leaf = next
+	age[ isLeaf ] = last[v] - top[ isLeaf ]
 
-		M.node[leaf][ 'color' ] = 'red'
+	# The root of T.
+	parent[0] = rootM
+	age[0] = 1
 
+	parent[ rootM ] = -1
 
-		# Give it an 'age' attribute.
-		M.node[leaf][ 'age' ] = nx.degree( M, node )
 
+	return parent, age, rootM
 
-		# We only use this if this is the first iteration of the loop.
-		isFirst = M.node[leaf][ 'age' ] == 0
 
-		if isFirst:
-			rootM = leaf
 
 
-		# Connect the leaf to the vertices in bloodLine
-		# and put them all to the queue.
-		for i in range(len( bloodLine )):
 
-			u = bloodLine[i]
+def treeBijection( T ):
+	'''
+
+	M = treeBijection( T )
+
+	In: T is a tree with vertices 0, 1, ..., n-1 such that
+		the children of each vertex are larger than the vertex itself
+		(and thus the smalles vertex, 0, is the root of T),
+		either a networkx.Graph or a planeTree.PlaneTree.
+
+	Out: M is a tree (planeTree.PlaneTree), with the same set of
+		vertices as T, that is made by the bijection described in
+		'Recurrence of bipartite planar maps' by S.O.S. and J.E.B.
+		The vertices in M are ordered such that 0 is the root,
+		the children of each vertex are in ascending from left to right,
+		all vertices in generation <=k are smaller than all vertices
+		in generation >k (for all k).
+
+	The mobile is found by treeToMobile.bijectionArrays
+	and relabeled by treeToMobile.relabelTree.
 
-			M.add_edge( leaf, u )
+	'''
 
-			M.node[u][ 'age' ] = M.node[u][ 'age' ] + i + isFirst
+	if not isinstance( T, planeTree.PlaneTree ):
 
-			Q.put( u )
+		T = planeTree.fromNetworkx( T, 0 )
 
 
+	parent, age, rootM = bijectionArrays( T )
 
 	# Relabel the vertices in M such that they obey the rules.
-	M = relabelTree( M, rootM )
+	M = relabelTree( parent, age, rootM )
+
+	del M.data[ 'vertex' ]
 
 	return M
 
@@ -212,6 +262,47 @@ def treeBijection( T ):
 
 
 
+def parityMask( M, root = 0 ):
+	'''
+
+	white = parityMask( M, root )
+
+	In: M is a tree, either a networkx.Graph with vertices
+		0, 1, ..., n-1 or a planeTree.PlaneTree (whose root is 0).
+		root is a vertex in M (default 0).
+
+	Out: white is a boolean vector such that white[v] == True if
+		and only if the distance from root to v is even.
+		If M is a mobile with root as root, then the white vertices
+		are the labeled ones (the vertices of the planar map)
+		and the others are black.
+
+	For a PlaneTree this is read off the depth vector, which is
+	computed a generation at a time. For a networkx.Graph the
+	depths are found by a breadth first search. There is no
+	recursion, so deep mobiles are fine.
+
+	'''
+
+	if isinstance( M, planeTree.PlaneTree ):
+
+		return M.depth % 2 == 0
+
+
+	import networkx as nx
+
+	white = np.zeros( len(M), dtype = bool )
+
+	depth = nx.single_source_shortest_path_length( M, root )
+
+	white[ [ v for v in depth if depth[v] % 2 == 0 ] ] = True
+
+	return white
+
+
+
+
+
 def colorMobile( M, node ):
 	'''
 
@@ -228,25 +319,50 @@ def colorMobile( M, node ):
 
 		Ironically, the 'color' attribute has not been changed.
 
+	Uses a stack instead of recursion. Note that makeMobile
+	does not need this, see treeToMobile.parityMask.
+
 	'''
 
-	if M.node[node][ 'shape' ] == 'point':
+	import networkx as nx
+
+	opposite = { 'point': 'circle', 'circle': 'point' }
+
+	stack = [ node ]
+
+	while stack:
+
+		u = stack.pop()
 
-		shape = 'circle'
+		shape = opposite.get( M.node[u][ 'shape' ], 'point' )
 
-	else:
+		for v in nx.all_neighbors( M, u ):
 
-		shape = 'point'
+			# If we have not already, we color v and all its descendants.
+			if not M.node[v][ 'shape' ] == shape:
 
+				M.node[v][ 'shape' ] = shape
 
-	for v in nx.all_neighbors( M, node ):
+				stack.append( v )
 
-		# If we have not already, we color v and all its descendants.
-		if not M.node[v][ 'shape' ] == shape:
 
-			M.node[v][ 'shape' ] = shape
 
-			colorMobile( M, v )
+
+
+def evenGeneration( M, root ):
+	'''
+
+	nodes = evenGeneration( M, root )
+
+	In: M is a tree with vertices 0, 1, ..., n-1
+		and root is a vertex in M.
+
+	Out: nodes is a list of the vertices in M whose distance
+		to root is even (including root), see parityMask.
+
+	'''
+
+	return np.flatnonzero( parityMask( M, root ) ).tolist()
 
 
 
@@ -296,6 +412,13 @@ def labelMobileDet( M, odd, parent ):
 
 
 
+# Probability distribution of jumps + 1 in labelMobileRand.
+# It is defined once, so that graphUtil.pmfTable can reuse its table.
+jumpDistribution = graphUtil.Distribution( lambda k: 0.5 ** ( k + 1. ),
+											mean = 1., variance = 2. )
+
+
+
 def labelMobileRand( M, odd, parent ):
 	'''
 
@@ -331,15 +454,11 @@ def labelMobileRand( M, odd, parent ):
 	# Maximum number of trials:
 	maxiter = 999
 
-	# Probability distribution of jumps + 1:
-	xi = lambda k: 0.5 ** ( k + 1. )
-
-
 	trials = 0
 
 	while True:
 
-		N = graphUtil.multinomial( n + 1, xi )
+		N = graphUtil.multinomial( n + 1, jumpDistribution )
 
 		K = len(N)
 
@@ -392,12 +511,152 @@ def labelMobileRand( M, odd, parent ):
 
 
 
+def randomLabels( M ):
+	'''
+
+	label = randomLabels( M )
+
+	In: M is a mobile (planeTree.PlaneTree) with root 0.
+
+	Out: label is an integer vector with random labels on the white
+		vertices of M (see parityMask) with the same distribution as
+		labelMobileRand gives, and 0 on the black vertices.
+		The root has label 0.
+
+	If a black vertex has k children, then the k+1 label jumps
+	around it are i.i.d. with P( jump = j ) = 0.5^(j+2), j >= -1,
+	conditioned on summing to 0. Then the jumps + 1 have probability
+	0.5^(2k+2) whatever they are, so they are a uniformly random
+	composition of k+1 into k+1 non-negative parts. Such a composition
+	is a random arrangement of k+1 stars and k bars, where the parts
+	are the numbers of stars between the bars. All the arrangements
+	are drawn at once by sorting random keys within each block, so
+	there is no rejection and no recursion.
+
+	'''
+
+	n = len(M)
+
+	white = parityMask( M )
+
+	black = np.flatnonzero( ~white )
+
+	# k[b] is the number of children of the b-th black vertex.
+	k = M.degrees[black]
+
+	length = 2 * k + 1
+
+	start = np.cumsum( length ) - length
+
+	block = np.repeat( np.arange( len(black) ), length )
+
+	position = np.arange( length.sum() ) - start[block]
+
+
+	# Shuffle k+1 stars and k bars within each block.
+	isStar = position <= k[block]
+
+	isStar = isStar[ np.lexsort(( np.random.random( len(block) ), block )) ]
+
+
+	# The number of stars up to each position in its block.
+	stars = np.cumsum( isStar )
+
+	stars = stars - ( stars[start] - isStar[start] )[block]
+
+	# The i-th bar of a block is at position stars + i - 1.
+	bars = np.flatnonzero( ~isStar )
+
+	i = position[bars] + 1 - stars[bars]
+
+	# The label of the i-th child of a black vertex minus the label of
+	# its parent is the number of stars before the i-th bar minus i.
+	# The children of the black vertices, in breadth first order,
+	# are the white vertices except the root.
+	jump = np.zeros( n, dtype = int )
+
+	jump[ np.flatnonzero( white )[1:] ] = stars[bars] - i
+
+
+	return labelsFromJumps( M, jump )
+
+
+
+
+def detLabels( M ):
+	'''
+
+	label = detLabels( M )
+
+	In: M is a mobile (planeTree.PlaneTree) with root 0.
+
+	Out: label is an integer vector with the labels given by the
+		(-1)-rule on the white vertices of M (see parityMask), as
+		labelMobileDet gives them, and 0 on the black vertices.
+		The root has label 0.
+
+	The i-th child (i = 1, 2, ...) of a black vertex has the label of
+	the parent of the black vertex minus i. With the children stored
+	consecutively, i is read off the child offsets, so all the
+	jumps are found at once.
+
+	'''
+
+	white = parityMask( M )
+
+	v = np.flatnonzero( white )[1:]
+
+	jump = np.zeros( len(M), dtype = int )
+
+	jump[v] = M.offsets[ M.parent[v] ] - v - 1
+
+	return labelsFromJumps( M, jump )
+
+
+
+
+def labelsFromJumps( M, jump ):
+	'''
+
+	Used by randomLabels and detLabels
+
+	label = labelsFromJumps( M, jump )
+
+	In: M is a mobile (planeTree.PlaneTree) with root 0.
+		jump is an integer vector.
+
+	Out: label is an integer vector such that the root has label 0,
+		the black vertices have label 0 and every other white vertex v
+		has label label[w] + jump[v], where w is its grandparent.
+		The labels are computed one generation at a time.
+
+	'''
+
+	label = np.zeros( len(M), dtype = int )
+
+	g = M.generations
+
+	parent = M.parent
+
+	for k in range( 2, len(g) - 1, 2 ):
+
+		v = np.arange( g[k], g[k+1] )
+
+		label[v] = label[ parent[ parent[v] ] ] + jump[v]
+
+	return label
+
+
+
+
+
 def makeMobile( T, root, labels = 0, color = True ):
 	'''
 
 	makeMobile( T, root, labels )
 
-	In: T is a tree with 'root' as root.
+	In: T is a tree with 'root' as root, either a networkx.Graph
+		or a planeTree.PlaneTree (then root must be 0).
 		labels is an integer (default 0).
 		color is a boolean (default True).
 
@@ -406,24 +665,46 @@ def makeMobile( T, root, labels = 0, color = True ):
 			... all 0 if labels == 0.
 			... selected deterministically if labels == 1.
 			... selected randomly if labels == 2.
-		If color == True, then T has been colored by treeToMobile.colorMobile.
+		If color == True, then the look of T has been recorded by
+		graphUtil.addStyle, such that the root is red and every
+		second generation has the same shape as the root, as in
+		treeToMobile.colorMobile. It is applied when T is saved.
+
+		If T is a PlaneTree, then the labels are the vector
+		T.data[ 'label' ], else they are 'label' attributes.
 
 	'''
 
 	if color:
 
-		# Initialise
-		Square = dict(zip( T.nodes(), [ 'square' ] * len(T) ))
-		Black = dict(zip( T.nodes(), [ 'black' ] * len(T) ))
-		nx.set_node_attributes( T, Square, 'shape' )
-		nx.set_node_attributes( T, Black, 'color' )
+		graphUtil.addStyle( T, 'shape', 'point' )
+		graphUtil.addStyle( T, 'color', 'black' )
+
+		graphUtil.addStyle( T, 'shape', 'circle',
+							functools.partial( evenGeneration, root = root ) )
 
 		# Make the root special.
-		T.node[root][ 'color' ] = 'red'
-		T.node[root][ 'shape' ] = 'circle'
+		graphUtil.addStyle( T, 'color', 'red', [ root ] )
+
+
+	if isinstance( T, planeTree.PlaneTree ):
+
+		if labels == 1:
+
+			T.data[ 'label' ] = detLabels( T )
+
+		elif labels == 2:
+
+			T.data[ 'label' ] = randomLabels( T )
+
+		else:
+
+			T.data[ 'label' ] = np.zeros( len(T), dtype = int )
+
+		return
 
-		colorMobile( T, root )
 
+	import networkx as nx
 
 	# Initialise all labels to zero.
 	Zero = dict(zip( T.nodes(), [0] * len(T) ))
@@ -457,19 +738,21 @@ def treeToMobile( T, labels = 0, color = True ):
 		the children of each vertex are larger than the vertex itself
 		(and thus the smalles vertex, 0, is the root of T).
 
-	Out: M is a tree, with the same set of vertices as T, that is
-		made by the bijection described in 'Recurrence of bipartite
-		planar maps' by S.O.S. and J.E.B.
+	Out: M is a tree (planeTree.PlaneTree), with the same set of
+		vertices as T, that is made by the bijection described in
+		'Recurrence of bipartite planar maps' by S.O.S. and J.E.B.
 		The vertices in M are ordered such that 0 is the root,
 		the children of each vertex are in ascending from left to right,
 		all vertices in generation <=k are smaller than all vertices
 		in generation >k (for all k).
 
-		M is a labeled mobile and the labels are...
+		M is a labeled mobile (labels in M.data[ 'label' ]) and
+		the labels are...
 			... all 0 if labels == 0.
 			... selected deterministically if labels == 1.
 			... selected randomly if labels == 2.
-		If color == True, then T has been colored by treeToMobile.colorMobile.
+		If color == True, then M has been colored as by
+		treeToMobile.colorMobile, see makeMobile.
 
 	'''
 